@@ -1,5 +1,5 @@
 from database.sync_helpers import init_db
-from database.lookup_helpers import get_user_team, get_current_gameweek
+from database.lookup_helpers import get_user_team, get_current_gameweek, get_live_points
 from auth.auth_services import create_user, authenticate
 from auth.session_manager import get_cookie_manager, check_auth, login_user, logout
 from fplapi.fpl_services import fetch_fpl_entry, FPLError
@@ -142,6 +142,12 @@ if not team_data:
 # Convert to DataFrame
 df = pd.DataFrame(team_data)
 
+# Use live points from the poller while the gameweek is in play
+if gameweek:
+    live_points = get_live_points(df["player_id"].tolist(), gameweek)
+    if live_points:
+        df["event_points"] = df["player_id"].map(live_points).fillna(df["event_points"]).astype(int)
+
 # Calculate summary stats
 total_value = df["cost"].sum()
 total_points = df["total_points"].sum()
@@ -5,7 +5,7 @@ import secrets
 from database.db import SessionLocal, engine, Base
 from database.models import User
 from database.lookup_helpers import get_current_gameweek
-from database.sync_helpers import sync_single_user_players
+from database.sync_helpers import sync_user_picks, count_data_version
 from fplapi.fpl_services import fetch_fpl_team, FPLError
 
 
@@ -33,6 +33,8 @@ def create_user(email: str, password: str, name: str, team_id: int) -> None:
         # Create user
         user = User(email=email, password_hash=hash_password(password), name=name, team_id=team_id)
         db.add(user)
+        # so the app's read replica shows the new user
+        count_data_version(db)
         db.commit()
 
         # Fetch and sync user's team picks (best effort - user still created if this fails)
@@ -40,7 +42,7 @@ def create_user(email: str, password: str, name: str, team_id: int) -> None:
             gameweek = get_current_gameweek()
             if gameweek:
                 team_data = fetch_fpl_team(team_id, gameweek)
-                sync_single_user_players(db, team_id, team_data["picks"])
+                sync_user_picks(db, team_id, gameweek, team_data["picks"])
         except FPLError:
             pass  # Team sync will happen when batch runs (e.g., GW1 before team is set)
 
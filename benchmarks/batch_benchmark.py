@@ -0,0 +1,240 @@
+"""
+Benchmark the full ffp_batch.py flow against synthetic data.
+
+The batch runs unchanged, except that the fpl_services fetch functions are swapped
+for the synthetic generator and the database is a scratch file. The time and peak
+python memory (tracemalloc) of every top level stage of the run are recorded and
+can be compared against a stored baseline. The shadow tables' setup and publish
+(shadow_tables) are stages of their own.
+
+    python -m benchmarks.batch_benchmark --players 800 --users 50
+    python -m benchmarks.batch_benchmark --players 5000 --past-seasons 10 --save-baseline
+    python -m benchmarks.batch_benchmark --players 5000 --past-seasons 10 --compare
+"""
+import argparse
+import contextlib
+import functools
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic_fpl import SyntheticConfig, SyntheticFPL
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "batch_baseline.json"
+
+# functions of ffp_batch that are entry points rather than stages
+NOT_STAGES = {"main", "build_parser"}
+
+
+class StageRecorder:
+    """ Wraps the functions of a module, recording time and peak memory of the outermost calls """
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        """ Record the block as a call of the stage, unless it runs inside another stage """
+        self._depth += 1
+        if self._depth > 1:
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else 0
+            self._depth -= 1
+
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "peak_mb": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["peak_mb"] = max(stage["peak_mb"], peak / 1024 / 1024)
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with self.measure(name):
+                return func(*args, **kwargs)
+
+        return timed
+
+    def wrap_context(self, name, context_manager):
+        """
+        Wraps a contextmanager function - calling one only creates its generator, the work is in
+        entering and exiting it (for shadow_tables the exit is the merge / publish). Those are
+        recorded as two stages, the block in between belongs to the stages it calls.
+        """
+        @functools.wraps(context_manager)
+        @contextlib.contextmanager
+        def timed(*args, **kwargs):
+            with self.measure(f"{name} (enter)"):
+                manager = context_manager(*args, **kwargs)
+                value = manager.__enter__()
+            try:
+                yield value
+            except BaseException:
+                with self.measure(f"{name} (exit)"):
+                    if not manager.__exit__(*sys.exc_info()):
+                        raise
+            else:
+                with self.measure(f"{name} (exit)"):
+                    manager.__exit__(None, None, None)
+
+        return timed
+
+
+def is_context_manager(func) -> bool:
+    """ Whether a function is a @contextlib.contextmanager """
+    return func is not inspect.unwrap(func) and inspect.isgeneratorfunction(inspect.unwrap(func))
+
+
+def run_benchmark(config: SyntheticConfig, trace_memory: bool = True) -> dict:
+    """ Run the full batch against a scratch database and return the per stage results """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "FFP_BENCH.db"
+        # must be set before the database modules are imported
+        os.environ["FFP_DATABASE_URL"] = f"sqlite:///{db_path}"
+
+        import ffp_batch
+        from database.db import SessionLocal, engine
+        from database.models import User
+
+        synthetic = SyntheticFPL(config)
+        for name in ("fetch_fpl_bootstrap", "fetch_fpl_fixtures", "fetch_fpl_player_summary", "fetch_fpl_team"):
+            setattr(ffp_batch, name, getattr(synthetic, name))
+
+        ffp_batch.init_db()
+        with SessionLocal() as db:
+            db.add_all(
+                User(email=f"user{i}@bench.local", password_hash="-", name=f"user {i}", team_id=i)
+                for i in range(1, config.users + 1)
+            )
+            db.commit()
+
+        recorder = StageRecorder(trace_memory)
+        originals = {}
+        for name, func in list(vars(ffp_batch).items()):
+            if inspect.isfunction(func) and name not in NOT_STAGES and not name.startswith("run_"):
+                originals[name] = func
+                wrap = recorder.wrap_context if is_context_manager(func) else recorder.wrap
+                setattr(ffp_batch, name, wrap(name, func))
+
+        args = ffp_batch.build_parser().parse_args(["all"])
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            # the batch reports progress per player, which would swamp the results
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                ffp_batch.run_all(args)
+        finally:
+            total_seconds = time.perf_counter() - start
+            if trace_memory:
+                tracemalloc.stop()
+            for name, func in originals.items():
+                setattr(ffp_batch, name, func)
+
+        engine.dispose()
+        db_size = db_path.stat().st_size
+
+    return {
+        "config": vars(config),
+        "total_seconds": total_seconds,
+        # the peak is reset for every stage, so the run's peak is the largest stage peak
+        "total_peak_mb": max((stage["peak_mb"] for stage in recorder.stages.values()), default=0.0),
+        "db_size_mb": db_size / 1024 / 1024,
+        "stages": recorder.stages,
+    }
+
+
+def print_results(results: dict, baseline: dict | None = None, tolerance: float = 0.2) -> bool:
+    """ Print the results (with the change against baseline). Returns False when a stage regressed """
+    ok = True
+    base_stages = baseline["stages"] if baseline else {}
+
+    print(f"{'stage':<32}{'calls':>7}{'seconds':>10}{'peak MB':>10}{'Δ time':>10}{'Δ mem':>10}")
+    for name, stage in results["stages"].items():
+        line = f"{name:<32}{stage['calls']:>7}{stage['seconds']:>10.3f}{stage['peak_mb']:>10.1f}"
+        base = base_stages.get(name)
+        if base:
+            time_change = change(stage["seconds"], base["seconds"])
+            mem_change = change(stage["peak_mb"], base["peak_mb"])
+            line += f"{time_change:>+10.0%}{mem_change:>+10.0%}"
+            # very short / small stages are too noisy to flag
+            if stage["seconds"] > 0.25 and time_change > tolerance or stage["peak_mb"] > 1 and mem_change > tolerance:
+                line += "  REGRESSION"
+                ok = False
+        print(line)
+
+    print(f"{'total':<32}{'':>7}{results['total_seconds']:>10.3f}{results['total_peak_mb']:>10.1f}")
+    print(f"database size : {results['db_size_mb']:.1f} MB")
+    return ok
+
+
+def change(value: float, base: float) -> float:
+    return 0.0 if base == 0 else (value - base) / base
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the FFP batch against synthetic data")
+    parser.add_argument("--players", type=int, default=SyntheticConfig.players)
+    parser.add_argument("--fixtures", type=int, default=SyntheticConfig.fixtures_per_player, help="finished fixtures per player")
+    parser.add_argument("--upcoming", type=int, default=SyntheticConfig.upcoming_per_player, help="upcoming fixtures per player")
+    parser.add_argument("--past-seasons", type=int, default=SyntheticConfig.past_seasons)
+    parser.add_argument("--users", type=int, default=SyntheticConfig.users)
+    parser.add_argument("--seed", type=int, default=SyntheticConfig.seed)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no memory figures)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare this run against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/growth per stage (0.2 = 20%%)")
+    parser.add_argument("--output", type=Path, help="also write the results as json")
+    args = parser.parse_args(argv)
+
+    config = SyntheticConfig(
+        players=args.players,
+        fixtures_per_player=args.fixtures,
+        upcoming_per_player=args.upcoming,
+        past_seasons=args.past_seasons,
+        users=args.users,
+        seed=args.seed,
+    )
+    results = run_benchmark(config, trace_memory=not args.no_memory)
+
+    baseline = None
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"no baseline at {args.baseline}, run with --save-baseline first")
+            return 1
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["config"] != results["config"]:
+            print(f"warning : baseline was recorded with {baseline['config']}")
+
+    ok = print_results(results, baseline, args.tolerance)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"baseline saved to {args.baseline}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Compare the rows/sec of the two ways of loading a table:
+
+- values      : insert(Model).values(batch) in chunks, as the syncs used to (a multi-VALUES
+                statement compiled by SQLAlchemy for every chunk)
+- executemany : sync_helpers.bulk_insert - one prepared single-row insert run with executemany
+                on the raw DBAPI cursor
+
+The rows are read from an existing database (FFP_DB.db by default, opened read only) and can
+be repeated with shifted primary keys to load more rows. Each run loads an empty scratch table.
+
+    python -m benchmarks.bulk_load_benchmark
+    python -m benchmarks.bulk_load_benchmark --scale 10 --repeat 3
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import Integer, create_engine, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import sessionmaker
+
+from database.db import Base, use_sqlite_transactions
+from database.models import (
+    Team,
+    Player,
+    PlayerPastFixture,
+    PlayerPastSeason,
+    TeamMetric,
+    PlayerMetric,
+)
+from database.sync_helpers import bulk_insert, chunked
+
+DEFAULT_SOURCE = Path(__file__).resolve().parent.parent / "FFP_DB.db"
+
+# table, and the chunk size the syncs used with insert().values()
+TABLES = [
+    (Team, 20),
+    (Player, 25),
+    (PlayerPastFixture, 100),
+    (PlayerPastSeason, 100),
+    (TeamMetric, 25),
+    (PlayerMetric, 25),
+]
+
+
+def load_rows(source: Path, model, scale: int) -> list[dict]:
+    """ The rows of a table, repeated scale times with the integer primary key columns shifted """
+    engine = create_engine(f"sqlite:///file:{source}?mode=ro&uri=true")
+    with engine.connect() as connection:
+        rows = [dict(row) for row in connection.execute(select(model.__table__)).mappings()]
+    engine.dispose()
+
+    int_keys = [c.name for c in model.__table__.primary_key.columns if isinstance(c.type, Integer)]
+    scaled = []
+    for copy in range(scale):
+        for row in rows:
+            scaled.append({**row, **{k: row[k] + copy * 1_000_000 for k in int_keys}})
+    return scaled
+
+
+def load_with_values(session, model, rows, chunk_size):
+    with session.begin():
+        for batch in chunked(rows, chunk_size):
+            session.execute(insert(model).values(batch))
+
+
+def load_with_executemany(session, model, rows, chunk_size):
+    with session.begin():
+        bulk_insert(session, model, rows)
+
+
+def time_load(load, model, rows, chunk_size) -> float:
+    """ Seconds to load the rows into an empty table of a scratch database """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{tmp_dir}/bulk.db")
+        use_sqlite_transactions(engine)
+        Base.metadata.create_all(engine, tables=[model.__table__])
+        Session = sessionmaker(bind=engine)
+
+        with Session() as session:
+            start = time.perf_counter()
+            load(session, model, rows, chunk_size)
+            seconds = time.perf_counter() - start
+        engine.dispose()
+    return seconds
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare insert().values() and executemany bulk loads per table")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE, help="database to read the rows from")
+    parser.add_argument("--scale", type=int, default=1, help="load the source rows this many times")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per method, the fastest is reported")
+    args = parser.parse_args(argv)
+
+    print(f"{'table':<26}{'rows':>9}{'values rows/s':>16}{'executemany rows/s':>21}{'speedup':>10}")
+    for model, chunk_size in TABLES:
+        rows = load_rows(args.source, model, args.scale)
+        if not rows:
+            continue
+
+        values = min(time_load(load_with_values, model, rows, chunk_size) for _ in range(args.repeat))
+        bulk = min(time_load(load_with_executemany, model, rows, chunk_size) for _ in range(args.repeat))
+        print(
+            f"{model.__tablename__:<26}{len(rows):>9}{len(rows) / values:>16,.0f}"
+            f"{len(rows) / bulk:>21,.0f}{values / bulk:>9.1f}x"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
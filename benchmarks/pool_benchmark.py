@@ -0,0 +1,106 @@
+"""
+Lookup throughput and connection pool waits of the web app under many simultaneous sessions.
+
+Each scenario starts a number of reader threads - one per concurrently running Streamlit
+page - that call app lookups in a loop against a copy of the source database, and reports the
+lookup latency and the checkout waits of the read pool (POOL_METRICS, see database/db.py).
+Once there are more readers than FFP_DB_READ_POOL_SIZE connections the waits show up here
+rather than as sqlite lock errors.
+
+    python -m benchmarks.pool_benchmark
+    python -m benchmarks.pool_benchmark --readers 4 16 64 --seconds 10
+    FFP_DB_READ_POOL_SIZE=16 python -m benchmarks.pool_benchmark
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_SOURCE = Path(__file__).resolve().parent.parent / "FFP_DB.db"
+
+
+def read_loop(lookups: list, stop: threading.Event, latencies: list, errors: list):
+    while not stop.is_set():
+        for lookup in lookups:
+            start = time.perf_counter()
+            try:
+                lookup()
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                # pool timeouts
+                errors.append(e)
+
+
+def run_scenario(readers: int, seconds: float) -> dict:
+    from database import lookup_helpers
+    from database.db import POOL_METRICS, pool_metrics
+
+    player_ids = [p["player_id"] for p in lookup_helpers.search_players(limit=15)]
+    lookups = [
+        lookup_helpers.get_current_gameweek,
+        lookup_helpers.get_all_teams,
+        lambda: lookup_helpers.get_player_details(player_ids[:5]),
+    ]
+    POOL_METRICS.clear()
+
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=read_loop, args=(lookups, stop, latencies, errors)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    read_pool = pool_metrics().get("read", {})
+    return {
+        "lookups_per_s": len(latencies) / seconds,
+        "errors": len(errors),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        "wait_p95_ms": read_pool.get("p95_wait_ms", 0.0),
+        "wait_max_ms": read_pool.get("max_wait_ms", 0.0),
+        "pool_size": read_pool.get("pool_size", 0),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="App lookups and pool checkout waits by number of concurrent sessions")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE, help="database to copy")
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 4, 8, 16, 32], help="concurrent reader threads per scenario")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each scenario")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "FFP_POOL.db"
+        shutil.copyfile(args.source, db_path)
+        # must be set before the database modules are imported
+        os.environ["FFP_DATABASE_URL"] = f"sqlite:///{db_path}"
+
+        from database.sync_helpers import init_db
+        from database.db import engine, read_engine
+        init_db()
+
+        print(f"{'readers':>8}{'pool':>6}{'lookups/s':>11}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'wait p95':>10}{'wait max':>10}")
+        for readers in args.readers:
+            r = run_scenario(readers, args.seconds)
+            print(
+                f"{readers:>8}{r['pool_size']:>6}{r['lookups_per_s']:>11.0f}{r['errors']:>8}{r['p50_ms']:>9.1f}"
+                f"{r['p95_ms']:>9.1f}{r['wait_p95_ms']:>10.1f}{r['wait_max_ms']:>10.1f}"
+            )
+
+        engine.dispose()
+        read_engine.dispose()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
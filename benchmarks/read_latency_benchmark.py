@@ -0,0 +1,148 @@
+"""
+Read latency of the web app while the batch is writing, with and without the engine profiles.
+
+A writer thread keeps reloading PlayerPastFixtures (delete all + bulk insert in one
+transaction, the heaviest write the batch has done) while the main thread runs an app style
+lookup in a loop and records how long each one takes. Each scenario runs against a fresh
+copy of the source database:
+
+- default  : both engines on the "default" profile (rollback journal, as before)
+- profiles : the writer on the "batch" profile (WAL) and the reader on the "app" profile
+- replica  : the writer on the "batch" profile and the reader on the app's in-memory replica
+             (database/replica.py) of the database
+
+    python -m benchmarks.read_latency_benchmark
+    python -m benchmarks.read_latency_benchmark --seconds 20
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database.db import Base, create_db_engine
+from database.migrations import run_migrations
+from database.replica import ReadReplica, ReplicaSessionmaker
+from database.models import Player, PlayerMetric, PlayerPastFixture
+from database.sync_helpers import bulk_insert
+
+DEFAULT_SOURCE = Path(__file__).resolve().parent.parent / "FFP_DB.db"
+
+# scenario name -> (writer profile, reader profile)
+SCENARIOS = {
+    "default": ("default", "default"),
+    "profiles": ("batch", "app"),
+    "replica": ("batch", "replica"),
+}
+
+
+def write_loop(Session, rows: list[dict], pause: float, stop: threading.Event, writes: list):
+    with Session() as session:
+        while not stop.is_set():
+            with session.begin():
+                session.execute(delete(PlayerPastFixture))
+                bulk_insert(session, PlayerPastFixture, rows)
+            writes.append(time.perf_counter())
+            # the batch calls the api between its writes
+            stop.wait(pause)
+
+
+def lookup(session):
+    """ The top rated players with their games played - like the app's player search """
+    games = (
+        select(PlayerPastFixture.player_id, func.count().label("games"))
+        .group_by(PlayerPastFixture.player_id)
+        .subquery()
+    )
+    return session.execute(
+        select(Player.web_name, PlayerMetric.player_rating, games.c.games)
+        .join(PlayerMetric, PlayerMetric.player_id == Player.player_id)
+        .outerjoin(games, games.c.player_id == Player.player_id)
+        .order_by(PlayerMetric.player_rating.desc())
+        .limit(20)
+    ).all()
+
+
+def run_scenario(source: Path, writer_profile: str, reader_profile: str, seconds: float, pause: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "FFP_LATENCY.db"
+        shutil.copyfile(source, db_path)
+        url = f"sqlite:///{db_path}"
+
+        writer = create_db_engine(url, writer_profile)
+        # brought up to the current schema, as the app does at startup
+        Base.metadata.create_all(writer)
+        run_migrations(writer)
+        WriteSession = sessionmaker(bind=writer)
+        if reader_profile == "replica":
+            # copied from the file through the "app" profile, as in the app
+            reader = create_db_engine(url, "app")
+            ReadSession = ReplicaSessionmaker(ReadReplica(reader))
+        else:
+            reader = create_db_engine(url, reader_profile)
+            ReadSession = sessionmaker(bind=reader)
+
+        with WriteSession() as session:
+            rows = [dict(row) for row in session.execute(select(PlayerPastFixture.__table__)).mappings()]
+
+        stop = threading.Event()
+        writes = []
+        writer_thread = threading.Thread(target=write_loop, args=(WriteSession, rows, pause, stop, writes))
+        writer_thread.start()
+
+        latencies = []
+        errors = 0
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            try:
+                with ReadSession() as session:
+                    lookup(session)
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                # database is locked
+                errors += 1
+
+        stop.set()
+        writer_thread.join()
+        writer.dispose()
+        reader.dispose()
+
+    latencies.sort()
+    return {
+        "reads": len(latencies),
+        "errors": errors,
+        "writes": len(writes),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="App read latency during batch writes, per engine profile")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE, help="database to copy for each scenario")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each scenario")
+    parser.add_argument("--write-pause", type=float, default=0.1, help="seconds between the writer's transactions")
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<12}{'writer':>8}{'reader':>9}{'reads':>8}{'errors':>8}{'writes':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    for name, (writer_profile, reader_profile) in SCENARIOS.items():
+        r = run_scenario(args.source, writer_profile, reader_profile, args.seconds, args.write_pause)
+        print(
+            f"{name:<12}{writer_profile:>8}{reader_profile:>9}{r['reads']:>8}{r['errors']:>8}{r['writes']:>8}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['max_ms']:>9.1f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Synthetic FPL api data for benchmarking the batch at scale.
+
+The shapes follow the example responses in fpl_bootstrap_example.json and
+fpl_fixtures_example.json, but the number of players, fixtures, past seasons
+and users can be set freely. Element summaries and picks are generated on
+demand (seeded by id), so the generator itself holds very little in memory.
+"""
+import copy
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+EXAMPLE_BOOTSTRAP = Path(__file__).resolve().parent.parent / "fpl_bootstrap_example.json"
+
+NO_TEAMS = 20
+
+
+@dataclass
+class SyntheticConfig:
+    players: int = 800
+    fixtures_per_player: int = 20  # finished gameweeks in each player's history
+    upcoming_per_player: int = 18
+    past_seasons: int = 3
+    users: int = 50
+    seed: int = 1
+
+
+class SyntheticFPL:
+    """ Generates api responses and provides drop-in replacements for the fpl_services fetch functions """
+
+    def __init__(self, config: SyntheticConfig):
+        self.config = config
+
+        example = json.loads(EXAMPLE_BOOTSTRAP.read_text(encoding="utf-8"))
+        self.element_template = example["elements"][0]
+        self.team_templates = example["teams"]
+        self.event_template = example["events"][0]
+
+        self.gameweek = config.fixtures_per_player
+        self.start = datetime(2025, 8, 15, 15, 0)
+        self.fixtures = self._build_fixtures()
+        self.elements = self._build_elements()
+
+    # ---------- generated data ----------
+
+    def _kickoff(self, event: int) -> str:
+        return (self.start + timedelta(days=7 * (event - 1))).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _build_fixtures(self) -> list[dict]:
+        """ Round robin between the teams, one game per team per gameweek """
+        rng = random.Random(self.config.seed)
+        teams = list(range(1, NO_TEAMS + 1))
+        fixtures = []
+        no_events = self.config.fixtures_per_player + self.config.upcoming_per_player
+
+        for event in range(1, no_events + 1):
+            rotation = teams[:1] + teams[1:][event % (NO_TEAMS - 1):] + teams[1:][:event % (NO_TEAMS - 1)]
+            for i in range(NO_TEAMS // 2):
+                team_h, team_a = rotation[i], rotation[-(i + 1)]
+                if event % 2:
+                    team_h, team_a = team_a, team_h
+
+                finished = event <= self.gameweek
+                fixtures.append({
+                    "code": 1000000 + len(fixtures),
+                    "event": event,
+                    "finished": finished,
+                    "finished_provisional": finished,
+                    "id": len(fixtures) + 1,
+                    "kickoff_time": self._kickoff(event),
+                    "minutes": 90 if finished else 0,
+                    "provisional_start_time": False,
+                    "started": finished,
+                    "team_a": team_a,
+                    "team_a_score": rng.randint(0, 4) if finished else None,
+                    "team_h": team_h,
+                    "team_h_score": rng.randint(0, 4) if finished else None,
+                    "team_h_difficulty": rng.randint(2, 5),
+                    "team_a_difficulty": rng.randint(2, 5),
+                    "pulse_id": 100000 + len(fixtures),
+                    "stats": [],
+                })
+
+        return fixtures
+
+    def _build_elements(self) -> list[dict]:
+        rng = random.Random(self.config.seed)
+        elements = []
+        for player_id in range(1, self.config.players + 1):
+            element = copy.deepcopy(self.element_template)
+            element.update({
+                "id": player_id,
+                "code": 100000 + player_id,
+                "first_name": "Player",
+                "second_name": str(player_id),
+                "web_name": f"P{player_id}",
+                "team": (player_id - 1) % NO_TEAMS + 1,
+                "team_code": (player_id - 1) % NO_TEAMS + 1,
+                "element_type": rng.randint(1, 4),
+                "now_cost": rng.randint(40, 150),
+                "total_points": rng.randint(0, 200),
+                "status": rng.choice("aaaaaaadis"),
+                "form": f"{rng.uniform(0, 10):.1f}",
+                "selected_by_percent": f"{rng.uniform(0, 60):.1f}",
+            })
+            elements.append(element)
+        return elements
+
+    def bootstrap(self) -> dict:
+        events = []
+        for event in range(1, self.config.fixtures_per_player + self.config.upcoming_per_player + 1):
+            e = copy.deepcopy(self.event_template)
+            e.update({
+                "id": event,
+                "name": f"Gameweek {event}",
+                "deadline_time": self._kickoff(event),
+                "finished": event <= self.gameweek,
+                "is_current": event == self.gameweek,
+                "is_next": event == self.gameweek + 1,
+                "can_manage": event > self.gameweek,
+            })
+            events.append(e)
+
+        teams = []
+        for team_id in range(1, NO_TEAMS + 1):
+            team = copy.deepcopy(self.team_templates[(team_id - 1) % len(self.team_templates)])
+            team.update({"id": team_id, "code": team_id})
+            teams.append(team)
+
+        return {"events": events, "teams": teams, "elements": copy.deepcopy(self.elements)}
+
+    def player_summary(self, player_id: int) -> dict:
+        rng = random.Random(self.config.seed * 100000 + player_id)
+        element = self.elements[player_id - 1]
+        team = element["team"]
+
+        history = []
+        upcoming = []
+        for f in self.fixtures:
+            if team not in (f["team_h"], f["team_a"]):
+                continue
+
+            is_home = f["team_h"] == team
+            if f["finished"]:
+                minutes = rng.choice([0, 0, 25, 65, 90, 90, 90])
+                history.append({
+                    "element": player_id,
+                    "fixture": f["id"],
+                    "opponent_team": f["team_a"] if is_home else f["team_h"],
+                    "total_points": rng.randint(0, 12) if minutes else 0,
+                    "was_home": is_home,
+                    "kickoff_time": f["kickoff_time"],
+                    "team_h_score": f["team_h_score"],
+                    "team_a_score": f["team_a_score"],
+                    "round": f["event"],
+                    "modified": False,
+                    "minutes": minutes,
+                    "goals_scored": rng.randint(0, 1),
+                    "assists": rng.randint(0, 1),
+                    "clean_sheets": rng.randint(0, 1),
+                    "goals_conceded": rng.randint(0, 3),
+                    "own_goals": 0,
+                    "penalties_saved": 0,
+                    "penalties_missed": 0,
+                    "yellow_cards": rng.randint(0, 1),
+                    "red_cards": 0,
+                    "saves": rng.randint(0, 5),
+                    "bonus": rng.randint(0, 3),
+                    "bps": rng.randint(0, 40),
+                    "influence": f"{rng.uniform(0, 60):.1f}",
+                    "creativity": f"{rng.uniform(0, 60):.1f}",
+                    "threat": f"{rng.uniform(0, 60):.1f}",
+                    "ict_index": f"{rng.uniform(0, 15):.1f}",
+                    "clearances_blocks_interceptions": rng.randint(0, 10),
+                    "recoveries": rng.randint(0, 10),
+                    "tackles": rng.randint(0, 5),
+                    "defensive_contribution": rng.randint(0, 15),
+                    "starts": 1 if minutes >= 60 else 0,
+                    "expected_goals": f"{rng.uniform(0, 1):.2f}",
+                    "expected_assists": f"{rng.uniform(0, 1):.2f}",
+                    "expected_goal_involvements": f"{rng.uniform(0, 2):.2f}",
+                    "expected_goals_conceded": f"{rng.uniform(0, 3):.2f}",
+                    "value": element["now_cost"],
+                    "transfers_balance": rng.randint(-5000, 5000),
+                    "selected": rng.randint(0, 1000000),
+                    "transfers_in": rng.randint(0, 5000),
+                    "transfers_out": rng.randint(0, 5000),
+                })
+            else:
+                upcoming.append({
+                    "id": f["id"],
+                    "code": f["code"],
+                    "team_h": f["team_h"],
+                    "team_h_score": None,
+                    "team_a": f["team_a"],
+                    "team_a_score": None,
+                    "event": f["event"],
+                    "finished": False,
+                    "minutes": 0,
+                    "provisional_start_time": False,
+                    "kickoff_time": f["kickoff_time"],
+                    "event_name": f"Gameweek {f['event']}",
+                    "is_home": is_home,
+                    "difficulty": f["team_h_difficulty"] if is_home else f["team_a_difficulty"],
+                })
+
+        past_seasons = []
+        for season in range(self.config.past_seasons):
+            start_year = 2024 - season
+            past_seasons.append({
+                "season_name": f"{start_year}/{str(start_year + 1)[2:]}",
+                "element_code": element["code"],
+                "start_cost": element["now_cost"],
+                "end_cost": element["now_cost"] + rng.randint(-5, 5),
+                "total_points": rng.randint(0, 250),
+                "minutes": rng.randint(0, 3420),
+                "goals_scored": rng.randint(0, 20),
+                "assists": rng.randint(0, 15),
+                "clean_sheets": rng.randint(0, 15),
+                "goals_conceded": rng.randint(0, 60),
+                "own_goals": 0,
+                "penalties_saved": 0,
+                "penalties_missed": 0,
+                "yellow_cards": rng.randint(0, 10),
+                "red_cards": 0,
+                "saves": rng.randint(0, 100),
+                "bonus": rng.randint(0, 30),
+                "bps": rng.randint(0, 900),
+                "influence": f"{rng.uniform(0, 900):.1f}",
+                "creativity": f"{rng.uniform(0, 900):.1f}",
+                "threat": f"{rng.uniform(0, 900):.1f}",
+                "ict_index": f"{rng.uniform(0, 250):.1f}",
+                "clearances_blocks_interceptions": rng.randint(0, 200),
+                "recoveries": rng.randint(0, 200),
+                "tackles": rng.randint(0, 100),
+                "defensive_contribution": rng.randint(0, 300),
+                "starts": rng.randint(0, 38),
+                "expected_goals": f"{rng.uniform(0, 20):.2f}",
+                "expected_assists": f"{rng.uniform(0, 15):.2f}",
+                "expected_goal_involvements": f"{rng.uniform(0, 35):.2f}",
+                "expected_goals_conceded": f"{rng.uniform(0, 60):.2f}",
+            })
+        past_seasons.reverse()  # oldest first, as returned by the api
+
+        return {"history": history, "fixtures": upcoming, "history_past": past_seasons}
+
+    def team_picks(self, entry_id: int, gameweek: int) -> dict:
+        rng = random.Random(self.config.seed * 1000 + entry_id)
+        squad = rng.sample(self.elements, 15)
+        picks = [
+            {
+                "element": e["id"],
+                "position": position,
+                "multiplier": 2 if position == 1 else (1 if position <= 11 else 0),
+                "is_captain": position == 1,
+                "is_vice_captain": position == 2,
+                "element_type": e["element_type"],
+            }
+            for position, e in enumerate(squad, start=1)
+        ]
+        return {"picks": picks, "entry_history": {"event": gameweek, "event_transfers": rng.randint(0, 2)}}
+
+    # ---------- fpl_services replacements ----------
+
+    def fetch_fpl_bootstrap(self) -> dict:
+        return self.bootstrap()
+
+    def fetch_fpl_fixtures(self) -> list[dict]:
+        return copy.deepcopy(self.fixtures)
+
+    def fetch_fpl_player_summary(self, player_id: int) -> dict:
+        return self.player_summary(player_id)
+
+    def fetch_fpl_team(self, entry_id: int, gameweek: int) -> dict:
+        return self.team_picks(entry_id, gameweek)
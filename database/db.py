@@ -1,10 +1,172 @@
-from sqlalchemy import create_engine
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
+
+# can be overridden, e.g. to run the batch benchmark against a scratch database
+DATABASE_URL = os.environ.get("FFP_DATABASE_URL", "sqlite:///./FFP_DB.db")
+
+# PRAGMAs set on every new connection of an engine, by profile
+ENGINE_PROFILES = {
+    # plain sqlite defaults
+    "default": {},
+    # the batch writer - WAL lets the app keep reading while the batch writes, NORMAL sync is
+    # safe under WAL (a power cut can lose the last commits, never corrupt), 64MB page cache
+    "batch": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+    },
+    # the web app's reads - memory mapped io (256MB), refuses writes, waits up to 5s on a lock
+    # instead of failing, temp tables / sorts in memory
+    "app": {
+        "mmap_size": 268435456,
+        "query_only": "ON",
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    # the app's in-memory copy of the database (database/replica.py) - refuses writes
+    "replica": {
+        "query_only": "ON",
+    },
+}
+
+# profile of the read-write engine (the batch sets "batch") and of the read only engine
+DB_PROFILE = os.environ.get("FFP_DB_PROFILE", "default")
+DB_READ_PROFILE = os.environ.get("FFP_DB_READ_PROFILE", "app")
+
+# connection pools, by role. A session waits up to pool_timeout for a connection once pool_size
+# are checked out, so the concurrency of each role is fixed rather than bounded by sqlite locks
+POOL_PROFILES = {
+    # the batch (at most a few nested sessions, one thread) and the app's auth writes - sqlite
+    # runs one write transaction at a time whatever the pool size
+    "write": {
+        "pool_size": int(os.environ.get("FFP_DB_WRITE_POOL_SIZE", "5")),
+        "max_overflow": 0,
+        "pool_timeout": 30,
+    },
+    # the app's lookups, one connection per concurrently running page
+    "read": {
+        "pool_size": int(os.environ.get("FFP_DB_READ_POOL_SIZE", "8")),
+        "max_overflow": 0,
+        "pool_timeout": 10,
+    },
+}
+
+# recent checkout waits kept per pool, for the percentiles
+POOL_METRICS_WINDOW = 1000
+
+
+class PoolMetrics:
+    """ How long sessions wait to check out a connection of a pool """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waits = deque(maxlen=POOL_METRICS_WINDOW)
+        self.pool = None
+        self._lock = threading.Lock()
+
+    def record(self, pool, wait: float):
+        with self._lock:
+            self.pool = pool
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.waits.append(wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self.waits)
+        return {
+            "checkouts": self.checkouts,
+            "checked_out": self.pool.checkedout() if self.pool is not None else 0,
+            "pool_size": self.pool.size() if self.pool is not None else 0,
+            "mean_wait_ms": self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0,
+            "p50_wait_ms": statistics.median(waits) * 1000 if waits else 0.0,
+            "p95_wait_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+# pool name -> metrics, shared by every engine created for the name (e.g. each replica copy)
+POOL_METRICS: dict[str, PoolMetrics] = {}
+
+
+class TimedQueuePool(QueuePool):
+    """ A QueuePool recording the checkout waits under its logging name in POOL_METRICS """
 
-DATABASE_URL = "sqlite:///./FFP_DB.db"  
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        metrics = POOL_METRICS.setdefault(self.logging_name, PoolMetrics())
+        metrics.record(self, time.perf_counter() - start)
+        return connection
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def pool_args(pool: str, name: str | None = None) -> dict:
+    """ create_engine arguments of a POOL_PROFILES pool, with its metrics recorded under name (default the pool) """
+    return {"poolclass": TimedQueuePool, "pool_logging_name": name or pool, **POOL_PROFILES[pool]}
+
+
+def pool_metrics() -> dict[str, dict]:
+    """ The checkout wait metrics of every pool so far """
+    return {name: metrics.snapshot() for name, metrics in POOL_METRICS.items()}
+
+
+def use_sqlite_transactions(engine):
+    """
+    Have SQLAlchemy begin the transactions rather than the pysqlite driver, which only begins
+    them before DML. Without this DDL (e.g. the batch's table swaps) runs outside the transaction.
+    This is the recipe from the SQLAlchemy sqlite dialect docs.
+    """
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def use_profile(engine, profile: str):
+    """ Set the PRAGMAs of an ENGINE_PROFILES profile on every new connection of the engine """
+    pragmas = ENGINE_PROFILES[profile]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = "default", pool: str | None = None, pool_name: str | None = None):
+    """ An engine with a profile's PRAGMAs and, when given, a POOL_PROFILES pool (metrics under pool_name) """
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        **(pool_args(pool, pool_name) if pool else {}),
+    )
+    use_sqlite_transactions(engine)
+    use_profile(engine, profile)
+    return engine
+
+
+# writer engine - the batch and the app's auth writes
+engine = create_db_engine(DATABASE_URL, DB_PROFILE, "write")
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# read only engine for the web app - the source of its in-memory replica, whose sessions
+# (ReadSessionLocal) are in database/replica.py. Its metrics are under "read_file", the
+# replica's under "read"
+read_engine = create_db_engine(DATABASE_URL, DB_READ_PROFILE, "read", "read_file")
+
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    pass
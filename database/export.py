@@ -0,0 +1,228 @@
+"""
+Columnar export of the database for analytics.
+
+export_db writes every table (and the EXPORT_FRAMES computed from them) to a directory of
+typed Parquet (or Feather) files, one directory per table, which pandas / pyarrow / duckdb read
+as a dataset:
+
+    export/Players/data.parquet
+    export/PlayerPastFixtures/season=2025-26/round=5/data.parquet
+    export/PlayerPastSeasons/season=2024-25/data.parquet
+
+History tables are partitioned by season and gameweek (PARTITIONS), hive style - the partition
+values are in the path, not the files. A manifest of the digest of every file's rows is kept
+in the directory, so a rerun rewrites only the files whose rows changed and removes those that
+no longer have rows - run after each batch it writes just the new round. The database only
+holds the current season of PlayerPastFixtures and PlayerLiveStats, so their files of earlier
+seasons are kept. Files are replaced atomically, so an analyst reading the export never sees a
+half written file.
+
+Credentials (Users) and the batch's own bookkeeping tables are not exported.
+
+Needs pyarrow, which is only imported when exporting.
+"""
+import hashlib
+import json
+import os
+from datetime import date, datetime
+
+from sqlalchemy import Select, func, select
+
+from database.db import Base
+from database.models import Player, PlayerMetric, Team, Fixture, BatchMetadata
+
+EXPORT_FORMATS = ("parquet", "feather")
+
+MANIFEST_FILE = "_manifest.json"
+
+# not exported - password hashes, and tables only the batch uses
+EXCLUDED_TABLES = {"Users", "user_picks_state", "batch_retry", "schema_version", "batch_metadata"}
+
+# table -> (season from: None for the current season or the column holding the season / date,
+#           gameweek partition column or None)
+PARTITIONS = {
+    "PlayerPastFixtures": (None, "round"),
+    "PlayerLiveStats": (None, "event"),
+    "PlayerSnapshots": ("snapshot_date", "gameweek"),
+    "PlayerPastSeasons": ("season_name", None),
+}
+
+# computed frames exported next to the tables
+EXPORT_FRAMES: dict[str, Select] = {
+    # every player with their team and calculated metrics
+    "player_ratings": (
+        select(
+            Player.player_id,
+            Player.web_name,
+            Player.element_type,
+            Team.short_name.label("team"),
+            Player.now_cost,
+            Player.total_points,
+            Player.form,
+            Player.selected_by_percent,
+            PlayerMetric.total_points_per_pound,
+            PlayerMetric.points_last_3_games,
+            PlayerMetric.points_per_pound_last_3_games,
+            PlayerMetric.selection_likelihood,
+            PlayerMetric.team_difficulty_next_3,
+            PlayerMetric.player_rating,
+            PlayerMetric.player_rank,
+            PlayerMetric.position_rank,
+        )
+        .join(Team, Team.team_id == Player.team)
+        .join(PlayerMetric, PlayerMetric.player_id == Player.player_id)
+        .order_by(Player.player_id)
+    ),
+}
+
+
+def season_of(day: date) -> str:
+    """ The season a date falls in, e.g. 2025-26 (seasons start in August) """
+    year = day.year if day.month >= 7 else day.year - 1
+    return f"{year}-{(year + 1) % 100:02d}"
+
+
+def current_season(connection) -> str:
+    """ The season of the loaded fixtures list (today's season before the first batch) """
+    first_kickoff = connection.scalar(select(func.min(Fixture.kickoff_time)))
+    return season_of(first_kickoff or date.today())
+
+
+def arrow_type(pa, column_type):
+    """ The arrow type of a SQLAlchemy column type """
+    types = {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        datetime: pa.timestamp("us"),
+        date: pa.date32(),
+    }
+    return types[column_type.python_type]
+
+
+def partition_path(table_name: str, row: dict, season: str) -> str:
+    """ The directory (relative to the table's) of a row of a partitioned table """
+    season_from, gameweek_column = PARTITIONS[table_name]
+    if season_from is not None:
+        value = row[season_from]
+        season = season_of(value) if isinstance(value, date) else value.replace("/", "-")
+
+    parts = [f"season={season}"]
+    if gameweek_column is not None:
+        parts.append(f"{gameweek_column}={row[gameweek_column]}")
+    return "/".join(parts)
+
+
+def earlier_season_file(relative: str, season: str) -> bool:
+    """
+    Whether a file of the export is of an earlier season of a table partitioned by the current
+    season - history the database no longer holds, kept in the export
+    """
+    table_name, _, directory = relative.partition("/")
+    if table_name not in PARTITIONS or PARTITIONS[table_name][0] is not None:
+        return False
+    return not directory.startswith(f"season={season}/")
+
+
+def write_file(pa, fmt: str, path: str, columns: dict[str, list], types: dict):
+    """ Write the columns as a typed arrow table, replacing the file atomically """
+    table = pa.table({name: pa.array(values, type=types[name]) for name, values in columns.items()})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.partial"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, partial, compression="zstd")
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, partial, compression="zstd")
+    os.replace(partial, path)
+
+
+def export_db(engine, out_dir: str, fmt: str = "parquet") -> dict:
+    """
+    Export the tables and frames to out_dir, writing only the files whose rows changed since the
+    last export there. Returns counts of the files written, unchanged and removed.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("the export needs pyarrow - pip install pyarrow") from e
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt}")
+
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    if manifest.get("format") != fmt:
+        manifest = {"files": {}}
+    old_files = manifest["files"]
+
+    sources = {
+        table.name: select(table).order_by(*table.primary_key.columns)
+        for table in Base.metadata.sorted_tables
+        if table.name not in EXCLUDED_TABLES
+    }
+    sources.update(EXPORT_FRAMES)
+
+    files = {}
+    counts = {"written": 0, "unchanged": 0, "removed": 0}
+    with engine.connect() as connection:
+        season = current_season(connection)
+        data_version = connection.scalar(select(BatchMetadata.data_version))
+
+        for name, query in sources.items():
+            result = connection.execute(query)
+            column_names = list(result.keys())
+            types = {c.name: arrow_type(pa, c.type) for c in query.selected_columns}
+
+            # rows grouped by the file they go to
+            groups: dict[str, list[dict]] = {}
+            for row in result.mappings():
+                directory = partition_path(name, row, season) if name in PARTITIONS else ""
+                groups.setdefault(directory, []).append(row)
+            if not groups and name not in PARTITIONS:
+                # an empty table still gets its (typed) file
+                groups[""] = []
+
+            dropped = [PARTITIONS[name][1]] if name in PARTITIONS else []
+            file_columns = [c for c in column_names if c not in dropped]
+            for directory, rows in groups.items():
+                relative = "/".join(p for p in (name, directory, f"data.{fmt}") if p)
+                digest = hashlib.sha1(repr([tuple(r[c] for c in file_columns) for r in rows]).encode()).hexdigest()
+                files[relative] = digest
+                if old_files.get(relative) == digest and os.path.exists(os.path.join(out_dir, relative)):
+                    counts["unchanged"] += 1
+                    continue
+
+                columns = {c: [r[c] for r in rows] for c in file_columns}
+                write_file(pa, fmt, os.path.join(out_dir, relative), columns, types)
+                counts["written"] += 1
+
+    # partitions (or tables) that no longer have rows
+    for relative in set(old_files) - set(files):
+        if earlier_season_file(relative, season):
+            files[relative] = old_files[relative]
+            continue
+        path = os.path.join(out_dir, relative)
+        if os.path.exists(path):
+            os.remove(path)
+            counts["removed"] += 1
+        directory = os.path.dirname(path)
+        while directory != os.path.normpath(out_dir) and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(f"{manifest_path}.partial", "w", encoding="utf-8") as f:
+        json.dump({"format": fmt, "data_version": data_version, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(f"{manifest_path}.partial", manifest_path)
+
+    print(
+        f"export to {out_dir} ({fmt}) : {counts['written']} files written, "
+        f"{counts['unchanged']} unchanged, {counts['removed']} removed"
+    )
+    return counts
@@ -1,10 +1,135 @@
-from database.db import SessionLocal
-from database.models import User, UserPlayers, Player, PlayerMetric, Team, TeamMetric, PlayerUpcomingFixture, PlayerPastFixture
-from sqlalchemy import text, select
+from database.replica import ReadSessionLocal, FileSessionLocal
+from database.models import User, UserPlayers, Player, PlayerDetail, PlayerMetric, Team, TeamMetric, Fixture, PlayerPastFixture, PlayerLiveStat, BatchMetadata, PlayerSnapshot, SNAPSHOT_FIELDS
+from sqlalchemy import Boolean, case, func, literal, select, text, union_all
+from sqlalchemy.orm import aliased
+from datetime import date
+
+def upcoming_fixtures_query(team_ids: list[int], limit: int = 6):
+    """
+    The next limit unfinished fixtures of each of the given teams - a player's fixtures are their
+    team's - with the opponent's short name and TeamMetric. Each side of the fixtures is read
+    from ix_Fixtures_next and numbered per team (n) in event order by a window. Rows come
+    unordered, sort each team's by n.
+    """
+    sides = union_all(
+        select(
+            Fixture.team_h.label("team_id"),
+            Fixture.team_a.label("opponent"),
+            literal(True, Boolean).label("is_home"),
+            Fixture.team_h_difficulty.label("difficulty"),
+            Fixture.event,
+            Fixture.team_h,
+            Fixture.team_a,
+        )
+        .where(Fixture.finished == False)
+        .where(Fixture.team_h.in_(team_ids)),
+        select(
+            Fixture.team_a,
+            Fixture.team_h,
+            literal(False, Boolean),
+            Fixture.team_a_difficulty,
+            Fixture.event,
+            Fixture.team_h,
+            Fixture.team_a,
+        )
+        .where(Fixture.finished == False)
+        .where(Fixture.team_a.in_(team_ids)),
+    ).subquery()
+
+    # the index order of a team's fixtures, as the single team query read them
+    ranked = select(
+        sides,
+        func.row_number().over(
+            partition_by=sides.c.team_id,
+            order_by=(sides.c.event, sides.c.team_h, sides.c.team_a),
+        ).label("n"),
+    ).subquery()
+
+    return (
+        select(
+            ranked.c.team_id,
+            ranked.c.n,
+            ranked.c.event,
+            ranked.c.is_home,
+            ranked.c.opponent,
+            ranked.c.difficulty,
+            Team.short_name.label("opponent_name"),
+            TeamMetric,
+        )
+        .outerjoin(Team, Team.team_id == ranked.c.opponent)
+        .outerjoin(TeamMetric, TeamMetric.team_id == ranked.c.opponent)
+        .where(ranked.c.n <= limit)
+    )
+
+
+def get_upcoming_fixtures(db, team_ids) -> dict[int, list]:
+    """ The upcoming_fixtures_query rows of the given teams, by team id in fixture order """
+    fixtures = {}
+    for row in db.execute(upcoming_fixtures_query(list(team_ids))):
+        fixtures.setdefault(row.team_id, []).append(row)
+    for rows in fixtures.values():
+        rows.sort(key=lambda row: row.n)
+    return fixtures
+
+
+def get_past_fixtures(db, player_ids: list[int], limit: int = 6) -> dict[int, list]:
+    """
+    The last limit games of each of the given players, as (PlayerPastFixture, opponent short
+    name) by player id, latest first. The games of each player are numbered by a window, so all
+    the players' are read in one query.
+    """
+    ranked = (
+        select(
+            PlayerPastFixture,
+            func.row_number().over(
+                partition_by=PlayerPastFixture.player_id,
+                order_by=(PlayerPastFixture.round.desc(), PlayerPastFixture.fixture_id.desc()),
+            ).label("n"),
+        )
+        .where(PlayerPastFixture.player_id.in_(player_ids))
+        .subquery()
+    )
+    past = aliased(PlayerPastFixture, ranked)
+    opponent = case((past.was_home, Fixture.team_a), else_=Fixture.team_h)
+
+    games = {}
+    rows = db.execute(
+        select(past, ranked.c.n, Team.short_name)
+        .outerjoin(Fixture, Fixture.fixture_id == past.fixture_id)
+        .outerjoin(Team, Team.team_id == opponent)
+        .where(ranked.c.n <= limit)
+    )
+    for pf, n, opponent_name in rows:
+        games.setdefault(pf.player_id, []).append((n, pf, opponent_name))
+    return {
+        player_id: [(pf, opponent_name) for _, pf, opponent_name in sorted(player_games, key=lambda g: g[0])]
+        for player_id, player_games in games.items()
+    }
+
+
+def get_batch_metadata() -> dict | None:
+    """
+    The batch_metadata row written by the last completed batch run: current / next gameweek,
+    next deadline, run id, completion time and data_version. None before the first run.
+    """
+    with ReadSessionLocal() as db:
+        row = db.execute(select(BatchMetadata.__table__).where(BatchMetadata.id == 1)).mappings().first()
+        return dict(row) if row else None
+
+
+def get_data_version() -> int:
+    """ Counts up with every completed batch run - use it as the key of anything cached from the database """
+    with ReadSessionLocal() as db:
+        return db.scalar(select(BatchMetadata.data_version).where(BatchMetadata.id == 1)) or 0
 
 
 def get_current_gameweek():
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
+        gameweek = db.scalar(select(BatchMetadata.current_gameweek).where(BatchMetadata.id == 1))
+        if gameweek is not None:
+            return gameweek
+
+        # not recorded until the batch next completes
         result = db.execute(
             text("SELECT MAX(round) AS game_week FROM PlayerPastFixtures")
         )
@@ -13,9 +138,28 @@ def get_current_gameweek():
         return gameweek
 
 
+def get_live_points(player_ids: list[int], gameweek: int) -> dict[int, int]:
+    """
+    Get the live gameweek points of the given players, as written by the live poller - read
+    from the file, as the poller writes them every minute during a match.
+
+    Returns dict of player_id -> points, empty when the gameweek is not being polled.
+    """
+    if not player_ids:
+        return {}
+
+    with FileSessionLocal() as db:
+        rows = db.execute(
+            select(PlayerLiveStat.player_id, PlayerLiveStat.total_points)
+            .where(PlayerLiveStat.event == gameweek)
+            .where(PlayerLiveStat.player_id.in_(player_ids))
+        ).all()
+        return {player_id: total_points for player_id, total_points in rows}
+
+
 def get_user_team_id(user_email: str) -> int | None:
     """Get the FPL team ID for a user by email."""
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         user = db.scalar(select(User).where(User.email == user_email))
         return user.team_id if user else None
 
@@ -26,37 +170,26 @@ def get_user_team(user_email: str) -> list[dict] | None:
 
     Returns list of player dicts sorted by squad position, or None if no team found.
     """
-    with SessionLocal() as db:
-        # Get user's team_id
-        user = db.scalar(select(User).where(User.email == user_email))
-        if not user:
-            return None
-
-        # Get all user's players
-        user_players = db.execute(
-            select(UserPlayers).where(UserPlayers.user_team_id == user.team_id)
-        ).scalars().all()
-
-        if not user_players:
+    with ReadSessionLocal() as db:
+        # the squad with each player's metrics and club, in one query
+        squad = db.execute(
+            select(UserPlayers, Player, PlayerMetric, Team.short_name)
+            .join(User, User.team_id == UserPlayers.user_team_id)
+            .join(Player, Player.player_id == UserPlayers.element)
+            .outerjoin(PlayerMetric, PlayerMetric.player_id == Player.player_id)
+            .outerjoin(Team, Team.team_id == Player.team)
+            .where(User.email == user_email)
+        ).all()
+
+        if not squad:
             return None
 
-        # Build team lookup for names
-        teams = {t.team_id: t for t in db.execute(select(Team)).scalars().all()}
-        team_metrics = {tm.team_id: tm for tm in db.execute(select(TeamMetric)).scalars().all()}
+        # the next 6 fixtures of every team in the squad, in one query
+        upcoming_by_team = get_upcoming_fixtures(db, {player.team for _, player, _, _ in squad})
 
         result = []
-        for up in user_players:
-            # Get player data
-            player = db.scalar(select(Player).where(Player.player_id == up.element))
-            if not player:
-                continue
-
-            # Get player metrics
-            metric = db.scalar(select(PlayerMetric).where(PlayerMetric.player_id == up.element))
-
-            # Get player's club
-            club = teams.get(player.team)
-            club_name = club.short_name if club else "???"
+        for up, player, metric, club_name in squad:
+            club_name = club_name or "???"
 
             # Position type mapping
             pos_map = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
@@ -120,28 +253,12 @@ def get_user_team(user_email: str) -> list[dict] | None:
                     "player_rank": 0,
                 })
 
-            # Get next 6 fixtures
-            upcoming = db.execute(
-                select(PlayerUpcomingFixture)
-                .where(PlayerUpcomingFixture.player_id == up.element)
-                .where(PlayerUpcomingFixture.finished == False)
-                .order_by(PlayerUpcomingFixture.event)
-                .limit(6)
-            ).scalars().all()
-
+            # Next 6 fixtures
             fixtures = []
-            for i, fix in enumerate(upcoming):
-                # Determine opponent team
-                if fix.is_home:
-                    opp_team_id = fix.team_a
-                    venue = "H"
-                else:
-                    opp_team_id = fix.team_h
-                    venue = "A"
-
-                opp_team = teams.get(opp_team_id)
-                opp_name = opp_team.short_name if opp_team else "???"
-                opp_metric = team_metrics.get(opp_team_id)
+            for fix in upcoming_by_team.get(player.team, []):
+                venue = "H" if fix.is_home else "A"
+                opp_name = fix.opponent_name or "???"
+                opp_metric = fix.TeamMetric
 
                 # Get appropriate strength metrics based on venue
                 # If we're home, opponent is away - use their away attack/defence
@@ -194,7 +311,7 @@ def get_all_player_news() -> list[dict]:
 
     Returns list of player dicts with news info, sorted by status severity then name.
     """
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         # Get all players with news
         players = db.execute(
             select(Player).where(Player.news != "")
@@ -236,7 +353,7 @@ def get_all_player_news() -> list[dict]:
 
 def get_all_teams() -> list[dict]:
     """Get all teams for filter dropdown."""
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         teams = db.execute(select(Team).order_by(Team.name)).scalars().all()
         return [{"team_id": t.team_id, "name": t.name, "short_name": t.short_name} for t in teams]
 
@@ -251,7 +368,7 @@ def get_user_team_player_ids(user_email: str, position: int | None = None) -> li
 
     Returns list of player IDs.
     """
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         user = db.scalar(select(User).where(User.email == user_email))
         if not user:
             return []
@@ -270,12 +387,32 @@ def get_user_team_player_ids(user_email: str, position: int | None = None) -> li
         return [up.element for up in user_players if up.element_type == position]
 
 
+# sort keys of search_players - players without metrics rank last, as if unrated
+SEARCH_SORT_KEYS = {
+    "position_rank": func.coalesce(PlayerMetric.position_rank, 9999),
+    "player_rank": func.coalesce(PlayerMetric.player_rank, 9999),
+    "player_rating": func.coalesce(PlayerMetric.player_rating, 0.0),
+    "total_points": Player.total_points,
+    "cost": Player.now_cost,
+    "form": Player.form,
+    "ppg": Player.points_per_game,
+    "ict_index": Player.ict_index,
+    "selected_by": Player.selected_by_percent,
+    "name": Player.web_name,
+}
+
+
 def search_players(
     positions: list[int] | None = None,
     team_ids: list[int] | None = None,
     min_price: float | None = None,
     max_price: float | None = None,
-) -> list[dict]:
+    sort: str = "position_rank",
+    descending: bool = False,
+    limit: int | None = None,
+    offset: int = 0,
+    with_total: bool = False,
+) -> list[dict] | tuple[list[dict], int]:
     """
     Search players with optional filters.
 
@@ -284,12 +421,24 @@ def search_players(
         team_ids: List of team IDs to filter by
         min_price: Minimum price in millions
         max_price: Maximum price in millions
-
-    Returns list of player dicts sorted by position_rank.
+        sort: SEARCH_SORT_KEYS key to order by (ties by player_id)
+        descending: Order by sort descending
+        limit: Return at most this many players (default all)
+        offset: Skip this many players first, for paging
+        with_total: Also return the number of players matching the filters
+
+    Returns list of player dicts in sort order - or (players, total) with with_total. Ordering
+    and paging are done by the query, so only the returned page is loaded.
     """
-    with SessionLocal() as db:
+    sort_key = SEARCH_SORT_KEYS[sort]
+
+    with ReadSessionLocal() as db:
         # Build query with filters
-        query = select(Player)
+        query = (
+            select(Player, PlayerMetric, Team.short_name)
+            .outerjoin(PlayerMetric, PlayerMetric.player_id == Player.player_id)
+            .outerjoin(Team, Team.team_id == Player.team)
+        )
 
         if positions:
             query = query.where(Player.element_type.in_(positions))
@@ -300,27 +449,34 @@ def search_players(
         if max_price is not None:
             query = query.where(Player.now_cost <= max_price * 10)
 
-        players = db.execute(query).scalars().all()
+        total = None
+        if with_total:
+            # counted over all the matches, before the limit - read from the first row
+            count_query = query.with_only_columns(func.count())
+            query = query.add_columns(func.count().over().label("total"))
 
-        # Build team lookup
-        teams = {t.team_id: t for t in db.execute(select(Team)).scalars().all()}
+        query = query.order_by(sort_key.desc() if descending else sort_key, Player.player_id)
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
 
-        # Build metrics lookup
-        metrics = {m.player_id: m for m in db.execute(select(PlayerMetric)).scalars().all()}
+        rows = db.execute(query).all()
+
+        if with_total:
+            # paged past the end, no row to read the total from
+            total = rows[0].total if rows else db.scalar(count_query) if offset else 0
 
         # Position type mapping
         pos_map = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
 
         result = []
-        for player in players:
-            club = teams.get(player.team)
-            metric = metrics.get(player.player_id)
-
+        for player, metric, club_name, *_ in rows:
             player_data = {
                 "player_id": player.player_id,
                 "name": player.web_name,
                 "full_name": f"{player.first_name} {player.second_name}",
-                "club": club.short_name if club else "???",
+                "club": club_name or "???",
                 "position": pos_map.get(player.element_type, "???"),
                 "element_type": player.element_type,
                 "cost": player.now_cost / 10,
@@ -356,9 +512,7 @@ def search_players(
 
             result.append(player_data)
 
-        # Sort by position_rank (lowest = best)
-        result.sort(key=lambda x: x["position_rank"])
-        return result
+        return (result, total) if with_total else result
 
 
 
@@ -375,25 +529,27 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
     if not player_ids:
         return []
 
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
+        # the detail view is the one lookup that reads the cold PlayerDetails columns - joined with
+        # the club, its metrics and the player's metrics of just the requested players
         players = db.execute(
-            select(Player).where(Player.player_id.in_(player_ids))
-        ).scalars().all()
-
-        # Build lookups
-        teams = {t.team_id: t for t in db.execute(select(Team)).scalars().all()}
-        team_metrics = {tm.team_id: tm for tm in db.execute(select(TeamMetric)).scalars().all()}
-        metrics = {m.player_id: m for m in db.execute(select(PlayerMetric)).scalars().all()}
+            select(Player, PlayerDetail, Team, TeamMetric, PlayerMetric)
+            .join(PlayerDetail, PlayerDetail.player_id == Player.player_id)
+            .outerjoin(Team, Team.team_id == Player.team)
+            .outerjoin(TeamMetric, TeamMetric.team_id == Player.team)
+            .outerjoin(PlayerMetric, PlayerMetric.player_id == Player.player_id)
+            .where(Player.player_id.in_(player_ids))
+        ).all()
+
+        # the next 6 fixtures of every club and the last 6 games of every player, a query each
+        upcoming_by_team = get_upcoming_fixtures(db, {player.team for player, *_ in players})
+        past_by_player = get_past_fixtures(db, player_ids)
 
         # Position type mapping
         pos_map = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
 
         result = []
-        for player in players:
-            club = teams.get(player.team)
-            club_metric = team_metrics.get(player.team)
-            metric = metrics.get(player.player_id)
-
+        for player, detail, club, club_metric, metric in players:
             player_data = {
                 # Core info
                 "player_id": player.player_id,
@@ -411,8 +567,8 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
 
                 # Value
                 "cost": player.now_cost / 10,
-                "cost_change_event": player.cost_change_event,
-                "cost_change_start": player.cost_change_start,
+                "cost_change_event": detail.cost_change_event,
+                "cost_change_start": detail.cost_change_start,
                 "value_form": player.value_form,
                 "value_season": player.value_season,
 
@@ -421,38 +577,38 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
                 "event_points": player.event_points,
                 "form": player.form,
                 "ppg": player.points_per_game,
-                "ep_next": player.ep_next,
-                "ep_this": player.ep_this,
+                "ep_next": detail.ep_next,
+                "ep_this": detail.ep_this,
 
                 # Playing time
                 "minutes": player.minutes,
                 "starts": player.starts,
 
                 # Goals & Assists
-                "goals_scored": player.goals_scored,
-                "assists": player.assists,
-                "expected_goals": player.expected_goals,
-                "expected_assists": player.expected_assists,
-                "expected_goal_involvements": player.expected_goal_involvements,
+                "goals_scored": detail.goals_scored,
+                "assists": detail.assists,
+                "expected_goals": detail.expected_goals,
+                "expected_assists": detail.expected_assists,
+                "expected_goal_involvements": detail.expected_goal_involvements,
 
                 # Defense
-                "clean_sheets": player.clean_sheets,
-                "goals_conceded": player.goals_conceded,
-                "expected_goals_conceded": player.expected_goals_conceded,
-                "own_goals": player.own_goals,
+                "clean_sheets": detail.clean_sheets,
+                "goals_conceded": detail.goals_conceded,
+                "expected_goals_conceded": detail.expected_goals_conceded,
+                "own_goals": detail.own_goals,
 
                 # GK specific
-                "saves": player.saves,
-                "penalties_saved": player.penalties_saved,
-                "penalties_missed": player.penalties_missed,
+                "saves": detail.saves,
+                "penalties_saved": detail.penalties_saved,
+                "penalties_missed": detail.penalties_missed,
 
                 # Cards
-                "yellow_cards": player.yellow_cards,
-                "red_cards": player.red_cards,
+                "yellow_cards": detail.yellow_cards,
+                "red_cards": detail.red_cards,
 
                 # Bonus
-                "bonus": player.bonus,
-                "bps": player.bps,
+                "bonus": detail.bonus,
+                "bps": detail.bps,
 
                 # ICT
                 "ict_index": player.ict_index,
@@ -461,60 +617,60 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
                 "threat": player.threat,
 
                 # ICT Ranks
-                "ict_index_rank": player.ict_index_rank,
-                "ict_index_rank_type": player.ict_index_rank_type,
-                "influence_rank": player.influence_rank,
-                "influence_rank_type": player.influence_rank_type,
-                "creativity_rank": player.creativity_rank,
-                "creativity_rank_type": player.creativity_rank_type,
-                "threat_rank": player.threat_rank,
-                "threat_rank_type": player.threat_rank_type,
+                "ict_index_rank": detail.ict_index_rank,
+                "ict_index_rank_type": detail.ict_index_rank_type,
+                "influence_rank": detail.influence_rank,
+                "influence_rank_type": detail.influence_rank_type,
+                "creativity_rank": detail.creativity_rank,
+                "creativity_rank_type": detail.creativity_rank_type,
+                "threat_rank": detail.threat_rank,
+                "threat_rank_type": detail.threat_rank_type,
 
                 # Defensive stats
-                "clearances_blocks_interceptions": player.clearances_blocks_interceptions,
-                "recoveries": player.recoveries,
-                "tackles": player.tackles,
-                "defensive_contribution": player.defensive_contribution,
+                "clearances_blocks_interceptions": detail.clearances_blocks_interceptions,
+                "recoveries": detail.recoveries,
+                "tackles": detail.tackles,
+                "defensive_contribution": detail.defensive_contribution,
 
                 # Per 90 stats
-                "expected_goals_per_90": player.expected_goals_per_90,
-                "expected_assists_per_90": player.expected_assists_per_90,
-                "expected_goal_involvements_per_90": player.expected_goal_involvements_per_90,
-                "expected_goals_conceded_per_90": player.expected_goals_conceded_per_90,
-                "goals_conceded_per_90": player.goals_conceded_per_90,
-                "saves_per_90": player.saves_per_90,
-                "starts_per_90": player.starts_per_90,
-                "clean_sheets_per_90": player.clean_sheets_per_90,
-                "defensive_contribution_per_90": player.defensive_contribution_per_90,
+                "expected_goals_per_90": detail.expected_goals_per_90,
+                "expected_assists_per_90": detail.expected_assists_per_90,
+                "expected_goal_involvements_per_90": detail.expected_goal_involvements_per_90,
+                "expected_goals_conceded_per_90": detail.expected_goals_conceded_per_90,
+                "goals_conceded_per_90": detail.goals_conceded_per_90,
+                "saves_per_90": detail.saves_per_90,
+                "starts_per_90": detail.starts_per_90,
+                "clean_sheets_per_90": detail.clean_sheets_per_90,
+                "defensive_contribution_per_90": detail.defensive_contribution_per_90,
 
                 # Transfer activity
                 "selected_by": player.selected_by_percent,
-                "transfers_in": player.transfers_in,
-                "transfers_in_event": player.transfers_in_event,
-                "transfers_out": player.transfers_out,
-                "transfers_out_event": player.transfers_out_event,
+                "transfers_in": detail.transfers_in,
+                "transfers_in_event": detail.transfers_in_event,
+                "transfers_out": detail.transfers_out,
+                "transfers_out_event": detail.transfers_out_event,
 
                 # Rankings
-                "now_cost_rank": player.now_cost_rank,
-                "now_cost_rank_type": player.now_cost_rank_type,
-                "form_rank": player.form_rank,
-                "form_rank_type": player.form_rank_type,
-                "ppg_rank": player.points_per_game_rank,
-                "ppg_rank_type": player.points_per_game_rank_type,
-                "selected_rank": player.selected_rank,
-                "selected_rank_type": player.selected_rank_type,
+                "now_cost_rank": detail.now_cost_rank,
+                "now_cost_rank_type": detail.now_cost_rank_type,
+                "form_rank": detail.form_rank,
+                "form_rank_type": detail.form_rank_type,
+                "ppg_rank": detail.points_per_game_rank,
+                "ppg_rank_type": detail.points_per_game_rank_type,
+                "selected_rank": detail.selected_rank,
+                "selected_rank_type": detail.selected_rank_type,
 
                 # Set pieces
-                "corners_order": player.corners_and_indirect_freekicks_order,
-                "corners_text": player.corners_and_indirect_freekicks_text,
-                "direct_fk_order": player.direct_freekicks_order,
-                "direct_fk_text": player.direct_freekicks_text,
-                "penalties_order": player.penalties_order,
-                "penalties_text": player.penalties_text,
+                "corners_order": detail.corners_and_indirect_freekicks_order,
+                "corners_text": detail.corners_and_indirect_freekicks_text,
+                "direct_fk_order": detail.direct_freekicks_order,
+                "direct_fk_text": detail.direct_freekicks_text,
+                "penalties_order": detail.penalties_order,
+                "penalties_text": detail.penalties_text,
 
                 # Other
-                "dreamteam_count": player.dreamteam_count,
-                "in_dreamteam": player.in_dreamteam,
+                "dreamteam_count": detail.dreamteam_count,
+                "in_dreamteam": detail.in_dreamteam,
             }
 
             # Add player's team metrics
@@ -576,27 +732,13 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
                 })
 
             # Get next 6 fixtures with opponent team metrics
-            upcoming = db.execute(
-                select(PlayerUpcomingFixture)
-                .where(PlayerUpcomingFixture.player_id == player.player_id)
-                .where(PlayerUpcomingFixture.finished == False)
-                .order_by(PlayerUpcomingFixture.event)
-                .limit(6)
-            ).scalars().all()
+            upcoming = upcoming_by_team.get(player.team, [])
 
             fixtures = []
             for fix in upcoming:
-                # Determine opponent team
-                if fix.is_home:
-                    opp_team_id = fix.team_a
-                    venue = "H"
-                else:
-                    opp_team_id = fix.team_h
-                    venue = "A"
-
-                opp_team = teams.get(opp_team_id)
-                opp_name = opp_team.short_name if opp_team else "???"
-                opp_metric = team_metrics.get(opp_team_id)
+                venue = "H" if fix.is_home else "A"
+                opp_name = fix.opponent_name or "???"
+                opp_metric = fix.TeamMetric
 
                 # Get opponent's strength metrics based on venue
                 if opp_metric:
@@ -660,18 +802,10 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
                 player_data[f"fix_{i+1}_opp_scored"] = fix["opp_goals_scored"]
                 player_data[f"fix_{i+1}_opp_conceded"] = fix["opp_goals_conceded"]
 
-            # Get last 6 past fixtures
-            past_fixtures = db.execute(
-                select(PlayerPastFixture)
-                .where(PlayerPastFixture.player_id == player.player_id)
-                .order_by(PlayerPastFixture.round.desc())
-                .limit(6)
-            ).scalars().all()
-
+            # Last 6 past fixtures
             past_matches = []
-            for pf in past_fixtures:
-                opp_team = teams.get(pf.opponent_team)
-                opp_name = opp_team.short_name if opp_team else "???"
+            for pf, opp_name in past_by_player.get(player.player_id, []):
+                opp_name = opp_name or "???"
                 venue = "H" if pf.was_home else "A"
 
                 past_matches.append({
@@ -739,3 +873,91 @@ def get_player_details(player_ids: list[int]) -> list[dict]:
         result_dict = {p["player_id"]: p for p in result}
         return [result_dict[pid] for pid in player_ids if pid in result_dict]
 
+
+
+def get_player_snapshots(player_ids: list[int], as_of: date | None = None) -> dict[int, dict[str, float]]:
+    """
+    The snapshot fields (price, ownership, form, rating ...) of the given players as they were
+    on as_of (default the latest).
+
+    Returns dict of player_id -> {field name: value}.
+    """
+    if not player_ids:
+        return {}
+
+    field_names = {code: name for name, code in SNAPSHOT_FIELDS.items()}
+    with ReadSessionLocal() as db:
+        # the value of the row with the latest date of each field, read along the primary key
+        query = (
+            select(
+                PlayerSnapshot.player_id,
+                PlayerSnapshot.field,
+                PlayerSnapshot.value,
+                func.max(PlayerSnapshot.snapshot_date),
+            )
+            .where(PlayerSnapshot.player_id.in_(player_ids))
+            .group_by(PlayerSnapshot.player_id, PlayerSnapshot.field)
+        )
+        if as_of is not None:
+            query = query.where(PlayerSnapshot.snapshot_date <= as_of)
+
+        result = {}
+        for player_id, field, value, _ in db.execute(query):
+            result.setdefault(player_id, {})[field_names[field]] = value
+        return result
+
+
+def get_player_time_series(
+    player_ids: list[int],
+    field: str,
+    start: date | None = None,
+    end: date | None = None,
+) -> dict[int, list[dict]]:
+    """
+    The history of one snapshot field (e.g. "now_cost") of the given players between start and
+    end. Only the dates the value changed are stored, so each point holds until the next one -
+    the first point is the value as of start (dated when it was set).
+
+    Returns dict of player_id -> list of {"date", "gameweek", "value"}, oldest first.
+    """
+    if not player_ids:
+        return {}
+
+    code = SNAPSHOT_FIELDS[field]
+    columns = (PlayerSnapshot.player_id, PlayerSnapshot.snapshot_date, PlayerSnapshot.gameweek, PlayerSnapshot.value)
+    with ReadSessionLocal() as db:
+        rows = []
+        if start is not None:
+            # the value each player had going into start
+            rows.extend(
+                (player_id, snapshot_date, gameweek, value)
+                for player_id, snapshot_date, gameweek, value in db.execute(
+                    select(
+                        PlayerSnapshot.player_id,
+                        func.max(PlayerSnapshot.snapshot_date),
+                        PlayerSnapshot.gameweek,
+                        PlayerSnapshot.value,
+                    )
+                    .where(PlayerSnapshot.player_id.in_(player_ids))
+                    .where(PlayerSnapshot.field == code)
+                    .where(PlayerSnapshot.snapshot_date < start)
+                    .group_by(PlayerSnapshot.player_id)
+                )
+            )
+
+        query = (
+            select(*columns)
+            .where(PlayerSnapshot.player_id.in_(player_ids))
+            .where(PlayerSnapshot.field == code)
+            .order_by(PlayerSnapshot.player_id, PlayerSnapshot.snapshot_date)
+        )
+        if start is not None:
+            query = query.where(PlayerSnapshot.snapshot_date >= start)
+        if end is not None:
+            query = query.where(PlayerSnapshot.snapshot_date <= end)
+        rows.extend(db.execute(query).all())
+
+        result = {}
+        for player_id, snapshot_date, gameweek, value in sorted(rows, key=lambda r: (r[0], r[1])):
+            result.setdefault(player_id, []).append({"date": snapshot_date, "gameweek": gameweek, "value": value})
+        return result
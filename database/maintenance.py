@@ -0,0 +1,90 @@
+"""
+Database maintenance, run by the batch after a full refresh.
+
+The nightly syncs rewrite and delete thousands of rows, which leaves free pages in the file
+and the query planner's statistics out of date. maintain_db:
+
+- refreshes the planner statistics (ANALYZE the first time, PRAGMA optimize after that)
+- returns free pages to the file system with incremental vacuum, for up to a time budget.
+  This needs auto_vacuum=INCREMENTAL, which an existing database only takes with one full
+  VACUUM - done on the first run
+- checkpoints the WAL (batch profile) back into the database file and truncates it
+
+and reports the file size, free page ratio and time spent.
+
+Statements run on the raw DBAPI connection, outside any SQLAlchemy transaction, as VACUUM and
+the checkpoint can't run inside one.
+"""
+import os
+import time
+
+# sqlite's auto_vacuum value for INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+# pages freed per incremental_vacuum step, the time budget is checked between steps
+VACUUM_STEP_PAGES = 256
+
+
+def db_stats(cursor) -> dict:
+    """ Size on disk (database file and WAL) and free pages of the connection's main database """
+    page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+    path = next(row[2] for row in cursor.execute("PRAGMA database_list") if row[1] == "main")
+    size = 0
+    for file in (path, f"{path}-wal"):
+        if file and os.path.exists(file):
+            size += os.path.getsize(file)
+
+    return {
+        "size_mb": size / 1024 / 1024,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "free_ratio": freelist_count / page_count if page_count else 0.0,
+    }
+
+
+def maintain_db(engine, vacuum_seconds: float = 10.0) -> dict:
+    """ Analyze, incrementally vacuum (within vacuum_seconds) and checkpoint. Returns the report """
+    timings = {}
+    with engine.connect() as connection:
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            before = db_stats(cursor)
+
+            start = time.perf_counter()
+            if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+                # re-analyzes only the tables whose statistics are out of date
+                cursor.execute("PRAGMA optimize").fetchall()
+            else:
+                cursor.execute("ANALYZE")
+            timings["analyze"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                print("maintenance : switching to incremental auto_vacuum (one full VACUUM)")
+                cursor.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+                cursor.execute("VACUUM")
+            else:
+                deadline = start + vacuum_seconds
+                while cursor.execute("PRAGMA freelist_count").fetchone()[0] and time.perf_counter() < deadline:
+                    # each step of the statement frees a page, so it must be read to the end
+                    cursor.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+            timings["vacuum"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            timings["checkpoint"] = time.perf_counter() - start
+
+            after = db_stats(cursor)
+        finally:
+            cursor.close()
+
+    seconds = sum(timings.values())
+    print(
+        f"maintenance : {before['size_mb']:.1f} MB -> {after['size_mb']:.1f} MB, "
+        f"free pages {before['free_ratio']:.1%} -> {after['free_ratio']:.1%}, {seconds:.2f}s "
+        f"({', '.join(f'{name} {t:.2f}s' for name, t in timings.items())})"
+    )
+    return {"before": before, "after": after, "seconds": seconds, "timings": timings}
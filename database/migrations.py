@@ -0,0 +1,211 @@
+"""
+Versioned schema migrations.
+
+init_db creates any missing tables from the models, then runs every migration newer than the
+database's schema_version, in order, each in its own transaction together with its
+schema_version row. A migration takes the connection and changes the schema in place with the
+helpers below.
+
+Fresh databases are created from the models, which already hold the latest schema, so every
+migration must be a no-op when its change is already there - the helpers check first.
+
+To change the schema: change the model, then add the next numbered migration here.
+"""
+from datetime import datetime
+
+from sqlalchemy import Index, MetaData, inspect, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+from database.models import SchemaVersion, Player, PlayerDetail, PlayerPastFixture, Fixture, ScaledFloat, UserPicksState
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """ Register a migration function (taking the connection) under the next version """
+    def register(func):
+        if MIGRATIONS and version != MIGRATIONS[-1][0] + 1:
+            raise ValueError(f"migration {version} is out of order")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+# ---------- helpers ----------
+
+def add_column(connection: Connection, model, column_name: str):
+    """ Add a model's column to its existing table (a NOT NULL column needs a server_default) """
+    table = model.__table__
+    if column_name in {c["name"] for c in inspect(connection).get_columns(table.name)}:
+        return
+
+    column_ddl = CreateColumn(table.c[column_name]).compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {column_ddl}')
+
+
+def create_index(connection: Connection, model, index_name: str):
+    """ Create one of a model's indexes """
+    index: Index = next(i for i in model.__table__.indexes if i.name == index_name)
+    index.create(connection, checkfirst=True)
+
+
+def create_table(connection: Connection, model):
+    """ Create a model's table (with its indexes) """
+    model.__table__.create(connection, checkfirst=True)
+
+
+def rebuild_table(connection: Connection, model, values: dict[str, str]):
+    """
+    Recreate a model's table from the old one, for changes sqlite can't make in place (dropped
+    columns, changed types). values maps a column to the SQL expression reading its value from
+    the old table - other columns are copied as they are.
+    """
+    table = model.__table__
+    new_name = f"{table.name}__rebuild"
+    connection.execute(CreateTable(table.to_metadata(MetaData(), name=new_name)))
+
+    columns = ", ".join(f'"{c.name}"' for c in table.columns)
+    selected = ", ".join(values.get(c.name, f'"{c.name}"') for c in table.columns)
+    connection.exec_driver_sql(f'INSERT INTO "{new_name}" ({columns}) SELECT {selected} FROM "{table.name}"')
+
+    connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{new_name}" RENAME TO "{table.name}"')
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def drop_table(connection: Connection, table_name: str):
+    """ Drop a table that no longer has a model """
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table_name}"')
+
+
+# ---------- migrations ----------
+
+@migration(1, "baseline - schema as created by create_all")
+def baseline(connection: Connection):
+    pass
+
+
+@migration(2, "indexes for the lookup_helpers queries")
+def lookup_indexes(connection: Connection):
+    create_index(connection, PlayerPastFixture, "ix_PlayerPastFixtures_player_round")
+    create_index(connection, PlayerPastFixture, "ix_PlayerPastFixtures_round")
+    # also indexed PlayerUpcomingFixtures, which migration 3 drops
+
+
+@migration(3, "Fixtures table replaces PlayerUpcomingFixtures")
+def fixtures_table(connection: Connection):
+    create_table(connection, Fixture)
+
+    if inspect(connection).has_table("PlayerUpcomingFixtures"):
+        # keep the upcoming fixtures until the batch next loads the full fixture list - each
+        # fixture is stored once per player, with the difficulty of that player's side
+        connection.exec_driver_sql(
+            '''
+            INSERT OR IGNORE INTO "Fixtures" (
+                fixture_id, code, team_h, team_h_score, team_h_difficulty, team_a, team_a_score,
+                team_a_difficulty, event, started, finished, finished_provisional, minutes,
+                provisional_start_time, kickoff_time
+            )
+            SELECT
+                fixture_id, MAX(code), MAX(team_h), MAX(team_h_score),
+                MAX(CASE WHEN is_home THEN difficulty END), MAX(team_a), MAX(team_a_score),
+                MAX(CASE WHEN NOT is_home THEN difficulty END), MAX(event), NULL, MAX(finished),
+                MAX(finished), MAX(minutes), MAX(provisional_start_time), MAX(kickoff_time)
+            FROM "PlayerUpcomingFixtures"
+            GROUP BY fixture_id
+            HAVING MAX(CASE WHEN is_home THEN difficulty END) IS NOT NULL
+               AND MAX(CASE WHEN NOT is_home THEN difficulty END) IS NOT NULL
+            '''
+        )
+        drop_table(connection, "PlayerUpcomingFixtures")
+
+
+@migration(4, "match facts of PlayerPastFixtures moved to Fixtures, scaled float stats")
+def past_fixture_stats(connection: Connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("PlayerPastFixtures")}
+    if "opponent_team" not in columns:
+        return
+
+    # fixtures the batch hasn't loaded yet get their facts from the player rows - a player's
+    # opponent is the other side. code, minutes and difficulty aren't known until the batch
+    # next loads the fixtures list
+    connection.exec_driver_sql(
+        '''
+        INSERT OR IGNORE INTO "Fixtures" (
+            fixture_id, code, team_h, team_h_score, team_h_difficulty, team_a, team_a_score,
+            team_a_difficulty, event, started, finished, finished_provisional, minutes,
+            provisional_start_time, kickoff_time
+        )
+        SELECT
+            f.fixture_id, 0,
+            COALESCE(MAX(CASE WHEN NOT f.was_home THEN f.opponent_team END), MAX(CASE WHEN f.was_home THEN p.team END)) AS team_h,
+            MAX(f.team_h_score), 0,
+            COALESCE(MAX(CASE WHEN f.was_home THEN f.opponent_team END), MAX(CASE WHEN NOT f.was_home THEN p.team END)) AS team_a,
+            MAX(f.team_a_score), 0, MAX(f.round), 1, 1, 1, 0, 0, MAX(f.kickoff_time)
+        FROM "PlayerPastFixtures" f
+        LEFT JOIN "Players" p ON p.player_id = f.player_id
+        GROUP BY f.fixture_id
+        HAVING team_h IS NOT NULL AND team_a IS NOT NULL
+        '''
+    )
+
+    scaled = {
+        name: f'CAST(ROUND("{name}" * {column.type.scale}) AS INTEGER)'
+        for name, column in PlayerPastFixture.__table__.columns.items()
+        if isinstance(column.type, ScaledFloat)
+    }
+    rebuild_table(connection, PlayerPastFixture, scaled)
+
+
+@migration(5, "Players split into hot Players and cold PlayerDetails")
+def player_details(connection: Connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("Players")}
+    if "ep_next" not in columns:
+        return
+
+    create_table(connection, PlayerDetail)
+    detail_columns = ", ".join(f'"{name}"' for name in PlayerDetail.__table__.columns.keys())
+    connection.exec_driver_sql(
+        f'INSERT OR REPLACE INTO "PlayerDetails" ({detail_columns}) SELECT {detail_columns} FROM "Players"'
+    )
+    rebuild_table(connection, Player, {})
+
+
+@migration(6, "user_picks_state no longer stores event_transfers")
+def picks_state_transfers(connection: Connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("user_picks_state")}
+    if "event_transfers" not in columns:
+        return
+
+    rebuild_table(connection, UserPicksState, {})
+
+
+# ---------- runner ----------
+
+def get_schema_version(connection: Connection) -> int:
+    return connection.scalar(select(SchemaVersion.version).order_by(SchemaVersion.version.desc()).limit(1)) or 0
+
+
+def run_migrations(engine) -> int:
+    """ Apply the pending migrations. Returns the schema version of the database """
+    with engine.connect() as connection:
+        current = get_schema_version(connection)
+
+    for version, description, func in MIGRATIONS:
+        if version <= current:
+            continue
+
+        print(f"migrate schema to {version} : {description}")
+        with engine.begin() as connection:
+            func(connection)
+            connection.execute(
+                insert(SchemaVersion)
+                .values(version=version, description=description, applied_at=datetime.now())
+                .on_conflict_do_nothing()
+            )
+        current = version
+
+    return current
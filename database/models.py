@@ -1,7 +1,29 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from database.db import Base
-from datetime import datetime
-from sqlalchemy import Integer, Boolean, String, DateTime,Float
+from datetime import date, datetime
+from sqlalchemy import Integer, Boolean, String, Date, DateTime,Float, Index
+from sqlalchemy.types import TypeDecorator
+
+
+class ScaledFloat(TypeDecorator):
+    """ A float with a fixed number of decimals, stored as a scaled integer (1-2 bytes in sqlite rather than 8) """
+    impl = Integer
+    cache_ok = True
+
+    def __init__(self, decimals: int):
+        super().__init__()
+        self.decimals = decimals
+        self.scale = 10 ** decimals
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else round(value * self.scale)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else value / self.scale
+
+    @property
+    def python_type(self):
+        return float
 
 
 class User(Base):
@@ -41,14 +63,49 @@ class Team(Base):
 class Player(Base):
     __tablename__ = "Players"
 
+    # The columns the player lists and searches show - the rest of the bootstrap element is in PlayerDetails
     player_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    can_transact: Mapped[bool] = mapped_column(Boolean, nullable=False)
-    can_select: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    first_name: Mapped[str] = mapped_column(String, nullable=False)
+    second_name: Mapped[str] = mapped_column(String, nullable=False)
+    web_name: Mapped[str] = mapped_column(String, nullable=False)
+
+    team: Mapped[int] = mapped_column(Integer, nullable=False)
+    element_type: Mapped[int] = mapped_column(Integer, nullable=False)
+    now_cost: Mapped[int] = mapped_column(Integer, nullable=False)
 
+    status: Mapped[str] = mapped_column(String(1), nullable=False)
+    news: Mapped[str] = mapped_column(String, nullable=False)
+    news_added: Mapped[str | None] = mapped_column(String, nullable=True)
     chance_of_playing_next_round: Mapped[int | None] = mapped_column(Integer, nullable=True)
     chance_of_playing_this_round: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
+    total_points: Mapped[int] = mapped_column(Integer, nullable=False)
+    event_points: Mapped[int] = mapped_column(Integer, nullable=False)
+    form: Mapped[float] = mapped_column(Float, nullable=False)
+    points_per_game: Mapped[float] = mapped_column(Float, nullable=False)
+    value_form: Mapped[float] = mapped_column(Float, nullable=False)
+    value_season: Mapped[float] = mapped_column(Float, nullable=False)
+    selected_by_percent: Mapped[float] = mapped_column(Float, nullable=False)
+
+    minutes: Mapped[int] = mapped_column(Integer, nullable=False)
+    starts: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    influence: Mapped[float] = mapped_column(Float, nullable=False)
+    creativity: Mapped[float] = mapped_column(Float, nullable=False)
+    threat: Mapped[float] = mapped_column(Float, nullable=False)
+    ict_index: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class PlayerDetail(Base):
+    __tablename__ = "PlayerDetails"
+
+    # The long tail of a player's bootstrap element, only read for the player detail view
+    player_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    can_transact: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    can_select: Mapped[bool] = mapped_column(Boolean, nullable=False)
+
     code: Mapped[int] = mapped_column(Integer, nullable=False)
 
     cost_change_event: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -57,56 +114,31 @@ class Player(Base):
     cost_change_start_fall: Mapped[int] = mapped_column(Integer, nullable=False)
 
     dreamteam_count: Mapped[int] = mapped_column(Integer, nullable=False)
-    element_type: Mapped[int] = mapped_column(Integer, nullable=False)
 
     ep_next: Mapped[float] = mapped_column(Float, nullable=False)
     ep_this: Mapped[float] = mapped_column(Float, nullable=False)
 
-    event_points: Mapped[int] = mapped_column(Integer, nullable=False)
-
-    first_name: Mapped[str] = mapped_column(String, nullable=False)
-    second_name: Mapped[str] = mapped_column(String, nullable=False)
-    web_name: Mapped[str] = mapped_column(String, nullable=False)
-
-    form: Mapped[float] = mapped_column(Float, nullable=False)
-    points_per_game: Mapped[float] = mapped_column(Float, nullable=False)
-
     in_dreamteam: Mapped[bool] = mapped_column(Boolean, nullable=False)
     removed: Mapped[bool] = mapped_column(Boolean, nullable=False)
     special: Mapped[bool] = mapped_column(Boolean, nullable=False)
     has_temporary_code: Mapped[bool] = mapped_column(Boolean, nullable=False)
 
-    news: Mapped[str] = mapped_column(String, nullable=False)
-    news_added: Mapped[str | None] = mapped_column(String, nullable=True)
-
-    now_cost: Mapped[int] = mapped_column(Integer, nullable=False)
     photo: Mapped[str] = mapped_column(String, nullable=False)
     opta_code: Mapped[str] = mapped_column(String, nullable=False)
 
-    selected_by_percent: Mapped[float] = mapped_column(Float, nullable=False)
-
     squad_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
-    status: Mapped[str] = mapped_column(String(1), nullable=False)
-
-    team: Mapped[int] = mapped_column(Integer, nullable=False)
     team_code: Mapped[int] = mapped_column(Integer, nullable=False)
     region: Mapped[int] = mapped_column(Integer, nullable=True)
 
-    total_points: Mapped[int] = mapped_column(Integer, nullable=False)
-
     transfers_in: Mapped[int] = mapped_column(Integer, nullable=False)
     transfers_in_event: Mapped[int] = mapped_column(Integer, nullable=False)
     transfers_out: Mapped[int] = mapped_column(Integer, nullable=False)
     transfers_out_event: Mapped[int] = mapped_column(Integer, nullable=False)
 
-    value_form: Mapped[float] = mapped_column(Float, nullable=False)
-    value_season: Mapped[float] = mapped_column(Float, nullable=False)
-
     team_join_date: Mapped[str] = mapped_column(String, nullable=True)
     birth_date: Mapped[str] = mapped_column(String, nullable=True)
 
-    minutes: Mapped[int] = mapped_column(Integer, nullable=False)
     goals_scored: Mapped[int] = mapped_column(Integer, nullable=False)
     assists: Mapped[int] = mapped_column(Integer, nullable=False)
     clean_sheets: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -123,18 +155,11 @@ class Player(Base):
     bonus: Mapped[int] = mapped_column(Integer, nullable=False)
     bps: Mapped[int] = mapped_column(Integer, nullable=False)
 
-    influence: Mapped[float] = mapped_column(Float, nullable=False)
-    creativity: Mapped[float] = mapped_column(Float, nullable=False)
-    threat: Mapped[float] = mapped_column(Float, nullable=False)
-    ict_index: Mapped[float] = mapped_column(Float, nullable=False)
-
     clearances_blocks_interceptions: Mapped[int] = mapped_column(Integer, nullable=False)
     recoveries: Mapped[int] = mapped_column(Integer, nullable=False)
     tackles: Mapped[int] = mapped_column(Integer, nullable=False)
     defensive_contribution: Mapped[int] = mapped_column(Integer, nullable=False)
 
-    starts: Mapped[int] = mapped_column(Integer, nullable=False)
-
     expected_goals: Mapped[float] = mapped_column(Float, nullable=False)
     expected_assists: Mapped[float] = mapped_column(Float, nullable=False)
     expected_goal_involvements: Mapped[float] = mapped_column(Float, nullable=False)
@@ -176,20 +201,24 @@ class Player(Base):
     clean_sheets_per_90: Mapped[float] = mapped_column(Float, nullable=False)
     defensive_contribution_per_90: Mapped[float] = mapped_column(Float, nullable=False)
 
+
 class PlayerPastFixture(Base):
     __tablename__ = "PlayerPastFixtures"
+    __table_args__ = (
+        # a player's most recent games (round desc)
+        Index("ix_PlayerPastFixtures_player_round", "player_id", "round"),
+        # the current gameweek - MAX(round) read from the index alone
+        Index("ix_PlayerPastFixtures_round", "round"),
+    )
 
+    # A player's stats in one fixture - the match itself (teams, kickoff, score) is in Fixtures
     fixture_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     player_id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
-    opponent_team: Mapped[int] = mapped_column(Integer, nullable=False)
     round: Mapped[int] = mapped_column(Integer, nullable=False)
 
+    # the side the player was on - opponent is Fixture.team_a if was_home else Fixture.team_h
     was_home: Mapped[bool] = mapped_column(Boolean, nullable=False)
-    kickoff_time: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
-
-    team_h_score: Mapped[int] = mapped_column(Integer, nullable=True)
-    team_a_score: Mapped[int] = mapped_column(Integer, nullable=True)
 
     total_points: Mapped[int] = mapped_column(Integer, nullable=True)
     minutes: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -210,10 +239,10 @@ class PlayerPastFixture(Base):
     bonus: Mapped[int] = mapped_column(Integer, nullable=True)
     bps: Mapped[int] = mapped_column(Integer, nullable=True)
 
-    influence: Mapped[float] = mapped_column(nullable=True)
-    creativity: Mapped[float] = mapped_column(nullable=True)
-    threat: Mapped[float] = mapped_column(nullable=True)
-    ict_index: Mapped[float] = mapped_column(nullable=True)
+    influence: Mapped[float] = mapped_column(ScaledFloat(1), nullable=True)
+    creativity: Mapped[float] = mapped_column(ScaledFloat(1), nullable=True)
+    threat: Mapped[float] = mapped_column(ScaledFloat(1), nullable=True)
+    ict_index: Mapped[float] = mapped_column(ScaledFloat(1), nullable=True)
 
     clearances_blocks_interceptions: Mapped[int] = mapped_column(Integer, nullable=True)
     recoveries: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -221,10 +250,10 @@ class PlayerPastFixture(Base):
     defensive_contribution: Mapped[int] = mapped_column(Integer, nullable=True)
     starts: Mapped[int] = mapped_column(Integer, nullable=True)
 
-    expected_goals: Mapped[float] = mapped_column(nullable=True)
-    expected_assists: Mapped[float] = mapped_column(nullable=True)
-    expected_goal_involvements: Mapped[float] = mapped_column(nullable=True)
-    expected_goals_conceded: Mapped[float] = mapped_column(nullable=True)
+    expected_goals: Mapped[float] = mapped_column(ScaledFloat(2), nullable=True)
+    expected_assists: Mapped[float] = mapped_column(ScaledFloat(2), nullable=True)
+    expected_goal_involvements: Mapped[float] = mapped_column(ScaledFloat(2), nullable=True)
+    expected_goals_conceded: Mapped[float] = mapped_column(ScaledFloat(2), nullable=True)
 
     value: Mapped[int] = mapped_column(Integer, nullable=True)
     transfers_balance: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -279,33 +308,40 @@ class PlayerPastSeason(Base):
     expected_goal_involvements: Mapped[float] = mapped_column(nullable=False)
     expected_goals_conceded: Mapped[float] = mapped_column(nullable=False)
 
-class PlayerUpcomingFixture(Base):
-    __tablename__ = "PlayerUpcomingFixtures"
+class Fixture(Base):
+    __tablename__ = "Fixtures"
+    __table_args__ = (
+        # a team's next unfinished fixtures (event order), covering the columns the lookups read
+        Index(
+            "ix_Fixtures_next",
+            "finished", "event", "team_h", "team_a", "team_h_difficulty", "team_a_difficulty",
+        ),
+    )
 
+    # One row per fixture of the season - a player's fixtures are those of their team
     fixture_id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    player_id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
     code: Mapped[int] = mapped_column(Integer, nullable=False)
 
     team_h: Mapped[int] = mapped_column(Integer, nullable=False)
     team_h_score: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    team_h_difficulty: Mapped[int] = mapped_column(Integer, nullable=False)
 
     team_a: Mapped[int] = mapped_column(Integer, nullable=False)
     team_a_score: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    team_a_difficulty: Mapped[int] = mapped_column(Integer, nullable=False)
 
-    event: Mapped[int] = mapped_column(Integer, nullable=True)
-    event_name: Mapped[str] = mapped_column(String, nullable=False)
+    # None until the fixture is scheduled
+    event: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
+    started: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     finished: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    finished_provisional: Mapped[bool] = mapped_column(Boolean, nullable=False)
     minutes: Mapped[int] = mapped_column(Integer, nullable=False)
 
     provisional_start_time: Mapped[bool] = mapped_column(Boolean, nullable=False)
     kickoff_time: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
 
-    is_home: Mapped[bool] = mapped_column(Boolean, nullable=False)
-    difficulty: Mapped[int] = mapped_column(Integer, nullable=False)
-
-
 
 class TeamMetric(Base):
     __tablename__ = "TeamMetric"
@@ -396,4 +432,104 @@ class UserPlayers(Base):
     is_vice_captain: Mapped[bool] = mapped_column(Boolean, nullable=False)
 
     # Player type (1 GK, 2 DEF, 3 MID, 4 FWD)
-    element_type: Mapped[int] = mapped_column(Integer, nullable=False)
\ No newline at end of file
+    element_type: Mapped[int] = mapped_column(Integer, nullable=False)
+
+class PlayerLiveStat(Base):
+    __tablename__ = "PlayerLiveStats"
+
+    # Only the gameweek being polled is kept
+    player_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    minutes: Mapped[int] = mapped_column(Integer, nullable=False)
+    goals_scored: Mapped[int] = mapped_column(Integer, nullable=False)
+    assists: Mapped[int] = mapped_column(Integer, nullable=False)
+    clean_sheets: Mapped[int] = mapped_column(Integer, nullable=False)
+    goals_conceded: Mapped[int] = mapped_column(Integer, nullable=False)
+    saves: Mapped[int] = mapped_column(Integer, nullable=False)
+    yellow_cards: Mapped[int] = mapped_column(Integer, nullable=False)
+    red_cards: Mapped[int] = mapped_column(Integer, nullable=False)
+    bonus: Mapped[int] = mapped_column(Integer, nullable=False)
+    bps: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    total_points: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class UserPicksState(Base):
+    __tablename__ = "user_picks_state"
+
+    user_team_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # Gameweek the stored picks belong to
+    gameweek: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Hash of element, squad position, multiplier and captaincy of every pick
+    picks_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+
+class BatchRetry(Base):
+    __tablename__ = "batch_retry"
+
+    # Item the batch failed to fetch - kind is "player" (element-summary) or "user" (picks)
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True)
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    error: Mapped[str] = mapped_column(String, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    failed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    # One row per migration applied to this database (see database/migrations.py)
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    description: Mapped[str] = mapped_column(String, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class BatchMetadata(Base):
+    __tablename__ = "batch_metadata"
+
+    # A single row (id 1), rewritten by every batch command that completes
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # Gameweek as the batch sees it (the last one that can no longer be managed) and the next one
+    current_gameweek: Mapped[int] = mapped_column(Integer, nullable=False)
+    next_gameweek: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    next_deadline: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    run_id: Mapped[str] = mapped_column(String(32), nullable=False)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    # Counts up on every completed run and every signup - the key for anything cached from
+    # the database
+    data_version: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+# codes of the PlayerSnapshot fields - append only, a code is never reused
+SNAPSHOT_FIELDS = {
+    "now_cost": 1,
+    "selected_by_percent": 2,
+    "form": 3,
+    "total_points": 4,
+    "points_per_game": 5,
+    "player_rating": 6,
+    "player_rank": 7,
+    "position_rank": 8,
+}
+
+
+class PlayerSnapshot(Base):
+    __tablename__ = "PlayerSnapshots"
+    # clustered on the key - a player's history of a field is one contiguous range
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    # Append only history of player state. A field's value is stored on the dates it changed,
+    # so its value on any date is the latest stored at or before that date
+    player_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    field: Mapped[int] = mapped_column(Integer, primary_key=True)
+    snapshot_date: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    gameweek: Mapped[int] = mapped_column(Integer, nullable=False)
+    value: Mapped[float] = mapped_column(ScaledFloat(2), nullable=False)
@@ -0,0 +1,159 @@
+"""
+In-memory read replica of the database for the web app.
+
+The app's whole working set is a few MB, so rather than reading the database file on every
+lookup it reads a copy held in memory, loaded with sqlite's backup API. The copy is a shared
+cache in-memory database, so each of the app's threads reads it through its own connection.
+
+Each lookup first asks sqlite whether anything was committed to the file since it last looked
+(PRAGMA data_version on a connection of its own, a few microseconds), and only then reads the
+data_version in batch_metadata. The batch counts that up when a command completes, and so does
+a signup (count_data_version). On a new version one lookup loads a fresh copy - outside the
+lock, the others keep reading the current copy meanwhile - and swaps it in. Sessions already
+open finish on the old copy, which is freed when they close. The batch writing the file never
+blocks a lookup.
+
+The live poller's points change every minute during a match, so they aren't worth a reload -
+get_live_points reads them from the file (FileSessionLocal).
+
+Until the batch has run against the file (no batch_metadata row) the lookups read the file.
+
+ReadSessionLocal is the sessionmaker of the lookups. Set FFP_DB_READ_REPLICA=0 to read the
+file directly instead (through the "app" profile's read_engine).
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database.db import pool_args, read_engine, use_profile, use_sqlite_transactions
+from database.models import BatchMetadata
+
+USE_READ_REPLICA = os.environ.get("FFP_DB_READ_REPLICA", "1") != "0"
+
+# names of the in-memory databases - each copy gets its own
+_replica_names = itertools.count(1)
+
+
+class ReadReplica:
+    """ An in-memory copy of the source engine's database, reloaded when its data_version changes """
+
+    def __init__(self, source_engine):
+        self.source_engine = source_engine
+        self.engine = None
+        self.data_version = None
+        self._keeper = None
+        # connection to the file kept for PRAGMA data_version, and the value it last returned
+        self._watch = None
+        self._file_version = None
+        # held for the version check and the swap, never while a copy loads
+        self._lock = threading.Lock()
+        # held by the one lookup loading a copy
+        self._load_lock = threading.Lock()
+
+    def get_engine(self):
+        """ The engine of the current copy - loading a fresh one first if the data has changed """
+        with self._lock:
+            file_version = self.file_version()
+            changed = file_version != self._file_version
+            self._file_version = file_version
+
+        if changed:
+            if self._load_lock.acquire(blocking=False):
+                try:
+                    version = self.source_version()
+                    if version is not None and version != self.data_version:
+                        self.load(version)
+                finally:
+                    self._load_lock.release()
+            else:
+                # another lookup is loading - check again once it has swapped its copy in
+                with self._lock:
+                    self._file_version = None
+
+        # read the file until the batch has published a version
+        engine = self.engine
+        return engine if engine is not None else self.source_engine
+
+    def file_version(self) -> int:
+        """ sqlite's data_version of the file - changes whenever another connection commits to it """
+        if self._watch is None:
+            path = self.source_engine.url.database
+            self._watch = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def source_version(self) -> int | None:
+        with self.source_engine.connect() as connection:
+            try:
+                return connection.scalar(select(BatchMetadata.data_version))
+            except OperationalError:
+                # a database the batch hasn't run against yet
+                return None
+
+    def load(self, version: int):
+        """ Copy the source database into a new in-memory database and swap to it """
+        start = time.perf_counter()
+        uri = f"file:ffp_replica_{next(_replica_names)}?mode=memory&cache=shared"
+
+        # the in-memory database lives as long as a connection to it is open
+        keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        with self.source_engine.connect() as connection:
+            connection.connection.dbapi_connection.backup(keeper)
+
+        engine = create_engine(
+            "sqlite://",
+            creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+            **pool_args("read"),
+        )
+        use_sqlite_transactions(engine)
+        use_profile(engine, "replica")
+
+        with self._lock:
+            old_engine, old_keeper = self.engine, self._keeper
+            self.engine, self._keeper, self.data_version = engine, keeper, version
+        if old_engine is not None:
+            # open sessions keep the old copy alive until they return their connection
+            old_engine.dispose()
+            old_keeper.close()
+
+        pages, page_size = (keeper.execute(f"PRAGMA {name}").fetchone()[0] for name in ("page_count", "page_size"))
+        size_mb = pages * page_size / 1024 / 1024
+        print(f"read replica loaded : data version {version}, {size_mb:.1f} MB in {time.perf_counter() - start:.2f}s")
+
+    def close(self):
+        """ Free the current copy and the watch connection """
+        with self._load_lock, self._lock:
+            if self.engine is not None:
+                self.engine.dispose()
+                self._keeper.close()
+            if self._watch is not None:
+                self._watch.close()
+            self.engine = self._keeper = self._watch = self._file_version = self.data_version = None
+
+
+class ReplicaSessionmaker(sessionmaker):
+    """ A sessionmaker whose sessions read the replica's current copy """
+
+    def __init__(self, replica: ReadReplica, **kw):
+        super().__init__(**kw)
+        self.replica = replica
+
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", self.replica.get_engine())
+        return super().__call__(**local_kw)
+
+
+read_replica = ReadReplica(read_engine)
+
+if USE_READ_REPLICA:
+    ReadSessionLocal = ReplicaSessionmaker(read_replica, autoflush=False, autocommit=False)
+else:
+    ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
+
+# sessions reading the file, for the data written between batch runs that isn't worth a reload
+FileSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
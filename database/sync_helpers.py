@@ -1,24 +1,35 @@
 from sqlalchemy.dialects.sqlite import insert
-from sqlalchemy import delete, select
+from sqlalchemy import Column, MetaData, String, Table, and_, bindparam, delete, func, select, tuple_, type_coerce, update
+from sqlalchemy.types import NullType
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.sql import visitors
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+import hashlib
 
 from database.models import (
     User,
     Team,
     Player,
+    PlayerDetail,
     PlayerPastFixture,
-    PlayerUpcomingFixture,
+    Fixture,
     PlayerPastSeason,
     TeamMetric,
     PlayerMetric,
-    UserPlayers
-    
-
+    UserPlayers,
+    PlayerLiveStat,
+    UserPicksState,
+    BatchRetry,
+    BatchMetadata,
+    PlayerSnapshot,
+    SNAPSHOT_FIELDS,
 )
 
 
 from database.db import engine, Base
+from database.migrations import run_migrations
 
 from itertools import islice
 
@@ -30,7 +41,323 @@ def parse_dt(value):
 
 
 def init_db():
+    # new tables come from the models, changes to existing ones from the migrations
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+# Diff sync - syncs compare the incoming rows with the stored ones and only write the changes.
+# Inside a shadow_tables() block the changes are staged in a shadow table per model and
+# published together when the block ends.
+SHADOW_SUFFIX = "__shadow"
+shadow_metadata = MetaData()
+
+# rows per executemany call of the bulk path
+BULK_CHUNK = 5000
+
+# model -> its shadow table (None until a change is staged) of the shadow_tables() blocks the
+# current thread is in. The block spans the sessions the syncs in it open, so it isn't kept on one
+_shadows: ContextVar[dict | None] = ContextVar("shadows", default=None)
+
+
+def primary_key(model) -> list[str]:
+    """ Primary key column names of a model's table """
+    return [column.name for column in model.__table__.primary_key.columns]
+
+
+def bind_processors(session: Session, table: Table) -> list:
+    """ The dialect's bind processor (or None) of each column of a table, in table order """
+    dialect = session.get_bind().dialect
+    return [c.type.dialect_impl(dialect).bind_processor(dialect) for c in table.columns]
+
+
+def bulk_execute(
+    session: Session,
+    stmt,
+    names: list[str],
+    params,
+) -> int:
+    """
+    Run a single-row statement for every tuple in params with executemany on the raw DBAPI
+    cursor of the session's connection (so in its transaction). The statement is compiled once;
+    params are bind processed values ordered as names, mapped onto the statement's parameters.
+    Rows are passed BULK_CHUNK at a time to bound the memory held. Returns the number of rows.
+    """
+    compiled = stmt.compile(dialect=session.get_bind().dialect)
+    order = [names.index(name) for name in compiled.positiontup]
+    reorder = order != list(range(len(names)))
+
+    count = 0
+    cursor = session.connection().connection.cursor()
+    try:
+        for batch in chunked(params, BULK_CHUNK):
+            if reorder:
+                batch = [tuple(values[i] for i in order) for values in batch]
+            cursor.executemany(str(compiled), batch)
+            count += len(batch)
+    finally:
+        cursor.close()
+    return count
+
+
+def bulk_insert(
+    session: Session,
+    model,
+    rows,
+    upsert: bool = False,
+) -> int:
+    """
+    Bulk load rows (any iterable of dicts with every column of the model) into its table - with
+    upsert, rows replace those with the same primary key. Returns the number of rows.
+    """
+    table = model.__table__
+    columns = model_columns(model)
+    processors = list(zip(columns, bind_processors(session, table)))
+    params = (
+        tuple(row[name] if process is None else process(row[name]) for name, process in processors)
+        for row in rows
+    )
+    stmt = insert(table)
+    if upsert:
+        key = primary_key(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key,
+            set_={c: stmt.excluded[c] for c in columns if c not in key},
+        )
+    return bulk_execute(session, stmt, columns, params)
+
+
+def shadow_table(model) -> Table:
+    """
+    The shadow of a model's table, holding its staged changes. sync_op is "u" for a row to
+    insert or update and "d" for a primary key to delete (the other columns are null).
+    """
+    name = model.__tablename__ + SHADOW_SUFFIX
+    if name not in shadow_metadata.tables:
+        Table(
+            name,
+            shadow_metadata,
+            *[
+                Column(c.name, c.type, primary_key=c.primary_key, nullable=True)
+                for c in model.__table__.columns
+            ],
+            Column("sync_op", String(1), nullable=False),
+        )
+    return shadow_metadata.tables[name]
+
+
+def write_changes(
+    session: Session,
+    model,
+    upserts: list[tuple],
+    deleted_keys: list[tuple],
+):
+    """
+    Upsert the changed rows (bind processed values in column order) and delete the given primary
+    keys of a model's table - or, inside a shadow_tables() block, stage them in its shadow.
+    Runs in the caller's transaction.
+    """
+    if not upserts and not deleted_keys:
+        return
+
+    live = model.__table__
+    columns = model_columns(model)
+    key = primary_key(model)
+
+    shadows = _shadows.get() or {}
+    if model in shadows:
+        if shadows[model] is None:
+            shadow = shadow_table(model)
+            # a shadow left by a batch that died is replaced
+            shadow.drop(session.connection(), checkfirst=True)
+            shadow.create(session.connection())
+            shadows[model] = shadow
+
+        table = shadows[model]
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key,
+            set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name not in key},
+        )
+        # deletes are staged as their key with every other column null
+        deletes = []
+        for k in deleted_keys:
+            key_values = dict(zip(key, k))
+            deletes.append(tuple(key_values.get(name) for name in columns) + ("d",))
+        bulk_execute(session, stmt, columns + ["sync_op"], (values + ("u",) for values in upserts))
+        bulk_execute(session, stmt, columns + ["sync_op"], deletes)
+        return
+
+    stmt = insert(live)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key,
+        set_={c: stmt.excluded[c] for c in columns if c not in key},
+    )
+    bulk_execute(session, stmt, columns, upserts)
+
+    stmt = delete(live).where(and_(*[live.c[k] == bindparam(k) for k in key]))
+    bulk_execute(session, stmt, key, deleted_keys)
+
+
+def stored_rows(
+    session: Session,
+    model,
+    where=None,
+) -> dict[tuple, tuple]:
+    """
+    The stored rows of a model's table (or those matching where) keyed by primary key, as their
+    stored (bind processed) values in column order. Inside a shadow_tables() block these are
+    the live rows with the changes staged so far applied, so a second sync of the model in the
+    block diffs against what the first one staged.
+    """
+    live = model.__table__
+    key_index = [model_columns(model).index(k) for k in primary_key(model)]
+
+    def read(table, clause):
+        # without result processing, so the values compare with the bound values
+        query = select(*[type_coerce(c, NullType()) for c in table.columns if c.name != "sync_op"])
+        if clause is not None:
+            query = query.where(clause)
+        return {tuple(row[i] for i in key_index): tuple(row) for row in session.execute(query)}
+
+    stored = read(live, where)
+    shadow = (_shadows.get() or {}).get(model)
+    if shadow is None:
+        return stored
+
+    # every staged key replaces its live row - with the staged row if it's an upsert matching where
+    for row in session.execute(select(*[shadow.c[k] for k in primary_key(model)])):
+        stored.pop(tuple(row), None)
+    staged = shadow.c.sync_op == "u"
+    if where is not None:
+        # the same clause on the shadow's columns
+        staged = and_(staged, visitors.replacement_traverse(
+            where, {}, lambda element: shadow.c[element.name] if getattr(element, "table", None) is live else None
+        ))
+    stored.update(read(shadow, staged))
+    return stored
+
+
+def sync_rows(
+    session: Session,
+    model,
+    rows,
+    where=None,
+) -> dict[str, int]:
+    """
+    Generic diff sync. rows (any iterable of dicts) is the complete new content of the model's
+    table, or of the part of it matching where (a clause on the model's columns).
+
+    Each incoming row is compared with the stored row of the same primary key on its stored
+    (bind processed) values. Only new and changed rows are upserted, and stored rows that are
+    no longer present are deleted. Returns the inserted / updated / deleted counts.
+    """
+    live = model.__table__
+    columns = model_columns(model)
+    key_index = [columns.index(k) for k in primary_key(model)]
+    processors = list(zip(columns, bind_processors(session, live)))
+
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+    with session.begin():
+        stored = stored_rows(session, model, where)
+
+        seen = set()
+        changed = []
+        for row in rows:
+            values = tuple(row[name] if process is None else process(row[name]) for name, process in processors)
+            row_key = tuple(values[i] for i in key_index)
+            seen.add(row_key)
+
+            stored_values = stored.get(row_key)
+            if stored_values == values:
+                continue
+
+            counts["inserted" if stored_values is None else "updated"] += 1
+            changed.append(values)
+            if len(changed) >= BULK_CHUNK:
+                write_changes(session, model, changed, [])
+                changed = []
+
+        deleted_keys = [k for k in stored if k not in seen]
+        counts["deleted"] = len(deleted_keys)
+        write_changes(session, model, changed, deleted_keys)
+
+    print(
+        f"sync {live.name} : {counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['deleted']} deleted"
+    )
+    return counts
+
+
+def delete_rows(
+    session: Session,
+    model,
+    where,
+) -> int:
+    """ Delete the rows of a model's table matching where (staged inside a shadow_tables() block). Returns the number deleted """
+    with session.begin():
+        keys = list(stored_rows(session, model, where))
+        write_changes(session, model, [], keys)
+    return len(keys)
+
+
+@contextmanager
+def shadow_tables(session: Session, *models):
+    """
+    Within the block the syncs of the given models stage their changes in shadow tables, so the
+    live tables are only read. On leaving the block all the staged changes are merged into the
+    live tables in one short transaction - readers never wait on the syncs and see either all of
+    the old data or all of the new. If the block fails the staged changes are dropped and the
+    live tables are unchanged.
+
+    The staging is per thread. A block can be nested in another for different models only.
+    """
+    outer = _shadows.get() or {}
+    nested = [model.__tablename__ for model in models if model in outer]
+    if nested:
+        raise ValueError(f"already in a shadow_tables block : {', '.join(nested)}")
+    shadows = {**outer, **{model: None for model in models}}
+    token = _shadows.set(shadows)
+    try:
+        yield
+    except BaseException:
+        with session.begin():
+            for model in models:
+                if shadows[model] is not None:
+                    shadows[model].drop(session.connection(), checkfirst=True)
+        raise
+    else:
+        staged = [model for model in models if shadows[model] is not None]
+        with session.begin():
+            connection = session.connection()
+            for model in staged:
+                live = model.__table__
+                shadow = shadows[model]
+                columns = model_columns(model)
+                key = primary_key(model)
+
+                upserts = insert(live).from_select(
+                    columns,
+                    select(*[shadow.c[c] for c in columns]).where(shadow.c.sync_op == "u"),
+                )
+                connection.execute(
+                    upserts.on_conflict_do_update(
+                        index_elements=key,
+                        set_={c: upserts.excluded[c] for c in columns if c not in key},
+                    )
+                )
+                connection.execute(
+                    delete(live).where(
+                        tuple_(*[live.c[k] for k in key]).in_(
+                            select(*[shadow.c[k] for k in key]).where(shadow.c.sync_op == "d")
+                        )
+                    )
+                )
+                shadow.drop(connection)
+        print(f"published : {', '.join(model.__tablename__ for model in staged) or 'no changes'}")
+    finally:
+        _shadows.reset(token)
+
 
 def sync_teams(session: Session, api_teams: list[dict]):
     print(f"sync teams : {len(api_teams)}")
@@ -62,10 +389,8 @@ def sync_teams(session: Session, api_teams: list[dict]):
     ]
     ids = [t["id"] for t in api_teams]
 
-    with session.begin():
-        if rows:
-            session.execute(delete(Team))
-            session.execute(insert(Team).values(rows))
+    if rows:
+        return sync_rows(session, Team, rows)
 
 
 def chunked(iterable, size):
@@ -74,6 +399,11 @@ def chunked(iterable, size):
         yield chunk
 
 
+def model_columns(model) -> list[str]:
+    """ Column names of a model's table, in table order """
+    return [column.name for column in model.__table__.columns]
+
+
 def sync_players(session: Session, api_players: list[dict]):
     print(f"sync players : {len(api_players)}")
 
@@ -186,30 +516,28 @@ def sync_players(session: Session, api_players: list[dict]):
 
     ids = [p["id"] for p in api_players]
 
-    with session.begin():
-        if rows:
-            session.execute(delete(Player))
-            # 1) Chunked insert
-            for batch in chunked(rows, 25):  # safe batch size for SQLite
-                session.execute(insert(Player).values(batch))
+    if rows:
+        # split between the hot (list / search) and cold (detail view) tables
+        hot_columns = model_columns(Player)
+        detail_columns = model_columns(PlayerDetail)
+        sync_rows(session, PlayerDetail, [{c: row[c] for c in detail_columns} for row in rows])
+        return sync_rows(session, Player, [{c: row[c] for c in hot_columns} for row in rows])
 
 
 def sync_player_past_fixtures(
     session: Session,
     api_fixtures: list[dict],
+    player_ids: list[int] | None = None,
 ):
     print(f"sync player_past_fixtures : {len(api_fixtures)}")
 
-    rows = [
+    # rows are built lazily, one insert chunk at a time
+    rows = (
         {
             "fixture_id": f["fixture"],
             "player_id": f["element"],
-            "opponent_team": f["opponent_team"],
             "round": f["round"],
             "was_home": f["was_home"],
-            "kickoff_time": parse_dt(f["kickoff_time"]),
-            "team_h_score": f["team_h_score"],
-            "team_a_score": f["team_a_score"],
             "total_points": f["total_points"],
             "minutes": f["minutes"],
             "goals_scored": f["goals_scored"],
@@ -245,66 +573,55 @@ def sync_player_past_fixtures(
             "modified": f["modified"],
         }
         for f in api_fixtures
-    ]
+    )
 
-    with session.begin():
-        if rows:
-            session.execute(
-                delete(PlayerPastFixture)
-            )
-            # 1) Chunked insert
-            for batch in chunked(rows, 100):  # safe batch size for SQLite
-                session.execute(
-                    insert(PlayerPastFixture).values(batch)
-                )
+    if player_ids is not None:
+        # only the rows of the given players
+        return sync_rows(session, PlayerPastFixture, rows, where=PlayerPastFixture.player_id.in_(player_ids))
+    elif api_fixtures:
+        return sync_rows(session, PlayerPastFixture, rows)
 
 
-def sync_player_upcoming_fixtures(
+def sync_fixtures(
     session: Session,
     api_fixtures: list[dict],
 ):
-    print(f"sync player_upcoming_fixtures : {len(api_fixtures)}")
+    print(f"sync fixtures : {len(api_fixtures)}")
 
     rows = [
         {
             "fixture_id": f["id"],
-            "player_id": f["player_id"],
             "code": f["code"],
             "team_h": f["team_h"],
             "team_h_score": f["team_h_score"],
+            "team_h_difficulty": f["team_h_difficulty"],
             "team_a": f["team_a"],
             "team_a_score": f["team_a_score"],
+            "team_a_difficulty": f["team_a_difficulty"],
             "event": f["event"],
-            "event_name": f.get("event_name", "TBD"),
+            "started": f["started"],
             "finished": f["finished"],
+            "finished_provisional": f["finished_provisional"],
             "minutes": f["minutes"],
             "provisional_start_time": f["provisional_start_time"],
             "kickoff_time": parse_dt(f["kickoff_time"]),
-            "is_home": f["is_home"],
-            "difficulty": f["difficulty"],
         }
         for f in api_fixtures
     ]
 
-    with session.begin():
-        if rows:
-            session.execute(
-                delete(PlayerUpcomingFixture)
-            )
+    if rows:
+        return sync_rows(session, Fixture, rows)
 
-            # 1) Chunked insert
-            for batch in chunked(rows, 100):  # safe batch size for SQLite
-                session.execute(
-                    insert(PlayerUpcomingFixture).values(batch)
-                )
 
 def sync_player_past_seasons(
     session: Session,
     api_seasons: list[dict],
+    player_ids: list[int] | None = None,
 ):
     print(f"sync player_past_seasons : {len(api_seasons)}")
 
-    rows = [
+    # rows are built lazily, one insert chunk at a time
+    rows = (
         {
             "season_name": s["season_name"],
             "player_id": s["player_id"],
@@ -340,19 +657,26 @@ def sync_player_past_seasons(
             "expected_goals_conceded": float(s["expected_goals_conceded"]),
         }
         for s in api_seasons
-    ]
+    )
+
+    if player_ids is not None:
+        # only the rows of the given players
+        return sync_rows(session, PlayerPastSeason, rows, where=PlayerPastSeason.player_id.in_(player_ids))
+    elif api_seasons:
+        return sync_rows(session, PlayerPastSeason, rows)
+
+
+def prune_player_rows(
+    session: Session,
+    player_ids: list[int],
+):
+    """Remove history and past seasons of players not in player_ids (the players in the game)."""
+    for model in (PlayerPastFixture, PlayerPastSeason):
+        deleted = delete_rows(session, model, model.player_id.not_in(player_ids))
+        if deleted:
+            print(f"pruned {model.__tablename__} : {deleted}")
 
-    with session.begin():
-        if rows:
-            session.execute(
-                delete(PlayerPastSeason)
-            )
 
-             # 1) Chunked insert
-            for batch in chunked(rows, 100):  # safe batch size for SQLite
-                session.execute(
-                    insert(PlayerPastSeason).values(batch)
-                )
 def sync_team_metrics(
     session: Session,
     team_metrics: list[dict],
@@ -378,15 +702,8 @@ def sync_team_metrics(
         for t in team_metrics
     ]
 
-    with session.begin():
-        if rows:
-            # wipe and reinsert (same approach as teams / players)
-            session.execute(delete(TeamMetric))
-
-            for batch in chunked(rows, 25):  # SQLite safe
-                session.execute(
-                    insert(TeamMetric).values(batch)
-                )
+    if rows:
+        return sync_rows(session, TeamMetric, rows)
 
 
 def sync_player_metrics(
@@ -423,15 +740,8 @@ def sync_player_metrics(
         for p in player_metrics
     ]
 
-    with session.begin():
-        if rows:
-            # wipe and reinsert (same approach as teams / players)
-            session.execute(delete(PlayerMetric))
-
-            for batch in chunked(rows, 25):  # SQLite safe
-                session.execute(
-                    insert(PlayerMetric).values(batch)
-                )
+    if rows:
+        return sync_rows(session, PlayerMetric, rows)
 
 
 def get_users(
@@ -445,37 +755,140 @@ def get_users(
         print(f"found {len(users)} users")
         return users
 
-def sync_user_players(
+
+def get_player_history(
     session: Session,
-    user_team_players: list[dict],
-):
-    print(f"sync user_team_players : {len(user_team_players)}")
+) -> dict[int, dict]:
+    """
+    Load the stored past fixtures of every player and the upcoming fixtures of their team, in the same shape as the
+    element-summary api ("history" oldest first, "fixtures" soonest first), so metrics
+    can be recalculated without calling the api again.
+    """
+    print(f"get player history")
 
-    rows = [
-        {
-            "element": p["element"],
-            "user_team_id": p["user_team_id"],
+    histories = {}
+    with session.begin():
+        past_fixtures = session.execute(
+            select(
+                PlayerPastFixture.player_id,
+                PlayerPastFixture.round,
+                PlayerPastFixture.total_points,
+                PlayerPastFixture.minutes,
+                PlayerPastFixture.starts,
+            )
+            .order_by(PlayerPastFixture.player_id, PlayerPastFixture.round, PlayerPastFixture.fixture_id)
+        )
 
-            "position": p["position"],
-            "multiplier": p["multiplier"],
+        for f in past_fixtures:
+            player_history = histories.setdefault(f.player_id, {"history": [], "fixtures": []})
+            player_history["history"].append({
+                "round": f.round,
+                "total_points": f.total_points,
+                "minutes": f.minutes,
+                "starts": f.starts,
+            })
 
-            "is_captain": p["is_captain"],
-            "is_vice_captain": p["is_vice_captain"],
+        # a player's upcoming fixtures are the unfinished fixtures of their team
+        team_fixtures = {}
+        upcoming_fixtures = session.execute(
+            select(Fixture.team_h, Fixture.team_a)
+            .where(Fixture.finished == False)
+            .order_by(Fixture.event.is_(None), Fixture.event, Fixture.kickoff_time)
+        ).all()
 
-            "element_type": p["element_type"],
-        }
-        for p in user_team_players
-    ]
+        for f in upcoming_fixtures:
+            team_fixtures.setdefault(f.team_h, []).append({"team_h": f.team_h, "team_a": f.team_a, "is_home": True})
+            team_fixtures.setdefault(f.team_a, []).append({"team_h": f.team_h, "team_a": f.team_a, "is_home": False})
+
+        for player_id, team in session.execute(select(Player.player_id, Player.team)):
+            if team in team_fixtures:
+                player_history = histories.setdefault(player_id, {"history": [], "fixtures": []})
+                player_history["fixtures"] = team_fixtures[team]
+
+    print(f"found history for {len(histories)} players")
+    return histories
 
+
+def get_latest_past_seasons(
+    session: Session,
+) -> dict[int, str]:
+    """Get the most recent stored past season of every player, keyed by player_id."""
     with session.begin():
-        if rows:
-            # wipe and reinsert (same approach as other syncs)
-            session.execute(delete(UserPlayers))
+        return dict(
+            session.execute(
+                select(PlayerPastSeason.player_id, func.max(PlayerPastSeason.season_name))
+                .group_by(PlayerPastSeason.player_id)
+            ).all()
+        )
 
-            for batch in chunked(rows, 25):  # SQLite safe
-                session.execute(
-                    insert(UserPlayers).values(batch)
-                )
+
+def picks_hash(picks_data: list[dict]) -> str:
+    """Hash of a squad - covers each pick's element, squad position (bench order), multiplier and captaincy."""
+    picks = sorted(
+        (p["position"], p["element"], p["multiplier"], p["is_captain"], p["is_vice_captain"])
+        for p in picks_data
+    )
+    return hashlib.sha256(repr(picks).encode()).hexdigest()
+
+
+def get_user_picks_states(
+    session: Session,
+) -> dict[int, dict]:
+    """Get the stored picks state (gameweek, picks_hash) of every user, keyed by user_team_id."""
+    with session.begin():
+        states = session.execute(select(UserPicksState.__table__)).mappings().all()
+        return {state["user_team_id"]: dict(state) for state in states}
+
+
+def sync_user_picks(
+    session: Session,
+    user_team_id: int,
+    gameweek: int,
+    picks_data: list[dict],
+) -> bool:
+    """
+    Record the user's picks for a gameweek, only rewriting user_players when the
+    picks hash differs from the stored one.
+
+    Returns True when the picks were rewritten.
+    """
+    new_hash = picks_hash(picks_data)
+    with session.begin():
+        stored_hash = session.scalar(
+            select(UserPicksState.picks_hash).where(UserPicksState.user_team_id == user_team_id)
+        )
+    changed = stored_hash != new_hash
+
+    if changed:
+        sync_single_user_players(session, user_team_id, picks_data)
+
+    with session.begin():
+        if changed:
+            count_data_version(session)
+        session.execute(
+            insert(UserPicksState)
+            .values(
+                user_team_id=user_team_id,
+                gameweek=gameweek,
+                picks_hash=new_hash,
+            )
+            .on_conflict_do_update(
+                index_elements=[UserPicksState.user_team_id],
+                set_={"gameweek": gameweek, "picks_hash": new_hash},
+            )
+        )
+
+    return changed
+
+
+def prune_user_players(
+    session: Session,
+    user_team_ids: list[int],
+):
+    """Remove the picks and picks state of teams no longer belonging to a user."""
+    with session.begin():
+        session.execute(delete(UserPlayers).where(UserPlayers.user_team_id.not_in(user_team_ids)))
+        session.execute(delete(UserPicksState).where(UserPicksState.user_team_id.not_in(user_team_ids)))
 
 
 def sync_single_user_players(
@@ -503,5 +916,207 @@ def sync_single_user_players(
             delete(UserPlayers).where(UserPlayers.user_team_id == user_team_id)
         )
         # Insert new picks
-        if rows:
-            session.execute(insert(UserPlayers).values(rows))
\ No newline at end of file
+        bulk_insert(session, UserPlayers, rows)
+
+
+def sync_player_live_stats(
+    session: Session,
+    gameweek: int,
+    api_elements: list[dict],
+) -> int:
+    """
+    Diff-based sync of the live stats for a gameweek - only players whose stats changed since
+    the last poll are written. Rows from any other gameweek, and of players no longer in the
+    gameweek's live data (e.g. removed from the game), are removed.
+
+    Returns the number of players written.
+    """
+    rows = {
+        e["id"]: {
+            "player_id": e["id"],
+            "event": gameweek,
+            "minutes": e["stats"]["minutes"],
+            "goals_scored": e["stats"]["goals_scored"],
+            "assists": e["stats"]["assists"],
+            "clean_sheets": e["stats"]["clean_sheets"],
+            "goals_conceded": e["stats"]["goals_conceded"],
+            "saves": e["stats"]["saves"],
+            "yellow_cards": e["stats"]["yellow_cards"],
+            "red_cards": e["stats"]["red_cards"],
+            "bonus": e["stats"]["bonus"],
+            "bps": e["stats"]["bps"],
+            "total_points": e["stats"]["total_points"],
+        }
+        for e in api_elements
+    }
+
+    with session.begin():
+        session.execute(delete(PlayerLiveStat).where(PlayerLiveStat.event != gameweek))
+
+        existing = {
+            row["player_id"]: dict(row)
+            for row in session.execute(select(PlayerLiveStat.__table__)).mappings()
+        }
+        changed = [row for player_id, row in rows.items() if existing.get(player_id) != row]
+        dropped = [player_id for player_id in existing if player_id not in rows]
+
+        bulk_insert(session, PlayerLiveStat, changed, upsert=True)
+        for batch in chunked(dropped, 500):
+            session.execute(delete(PlayerLiveStat).where(PlayerLiveStat.player_id.in_(batch)))
+
+    print(f"sync player_live_stats : {len(changed)} changed, {len(dropped)} removed of {len(rows)}")
+    return len(changed)
+
+
+def get_batch_retries(
+    session: Session,
+) -> dict[str, list[int]]:
+    """Get the ids queued for retry, keyed by kind ("player" / "user")."""
+    retries = {}
+    with session.begin():
+        for kind, item_id in session.execute(
+            select(BatchRetry.kind, BatchRetry.item_id).order_by(BatchRetry.kind, BatchRetry.item_id)
+        ):
+            retries.setdefault(kind, []).append(item_id)
+    return retries
+
+
+def sync_batch_retries(
+    session: Session,
+    kind: str,
+    failed: dict[int, str],
+    succeeded: list[int],
+):
+    """
+    Queue the failed ids of a kind (with their error) for retry and clear the ones that succeeded.
+    An id that fails again keeps its place in the queue with its attempts counted up.
+    """
+    if failed:
+        print(f"sync batch_retry : {len(failed)} {kind} failures queued")
+
+    now = datetime.now()
+    with session.begin():
+        for batch in chunked(succeeded, 500):
+            session.execute(
+                delete(BatchRetry).where(BatchRetry.kind == kind, BatchRetry.item_id.in_(batch))
+            )
+
+        for item_id, error in failed.items():
+            session.execute(
+                insert(BatchRetry)
+                .values(kind=kind, item_id=item_id, error=error, attempts=1, failed_at=now)
+                .on_conflict_do_update(
+                    index_elements=[BatchRetry.kind, BatchRetry.item_id],
+                    set_={"error": error, "attempts": BatchRetry.attempts + 1, "failed_at": now},
+                )
+            )
+
+
+def sync_batch_metadata(
+    session: Session,
+    run_id: str,
+    gameweek: int | None = None,
+    next_gameweek: int | None = None,
+    next_deadline: datetime | None = None,
+) -> int:
+    """
+    Record a completed batch run in the batch_metadata row and count its data_version up.
+    Without a gameweek (a run that didn't read the bootstrap) the stored gameweek is kept.
+    Returns the new data_version.
+    """
+    now = datetime.now()
+    with session.begin():
+        if gameweek is None:
+            session.execute(
+                update(BatchMetadata)
+                .where(BatchMetadata.id == 1)
+                .values(run_id=run_id, completed_at=now, data_version=BatchMetadata.data_version + 1)
+            )
+        else:
+            values = {
+                "current_gameweek": gameweek,
+                "next_gameweek": next_gameweek,
+                "next_deadline": next_deadline,
+                "run_id": run_id,
+                "completed_at": now,
+            }
+            session.execute(
+                insert(BatchMetadata)
+                .values(id=1, data_version=1, **values)
+                .on_conflict_do_update(
+                    index_elements=[BatchMetadata.id],
+                    set_={**values, "data_version": BatchMetadata.data_version + 1},
+                )
+            )
+
+        data_version = session.scalar(select(BatchMetadata.data_version).where(BatchMetadata.id == 1)) or 0
+
+    print(f"batch run {run_id} complete : data version {data_version}")
+    return data_version
+
+
+def count_data_version(
+    session: Session,
+):
+    """
+    Count the data_version up in the transaction of a write made outside a batch command (a
+    signup), so the app's read replica reloads and shows it straight away.
+    Does nothing before the batch has first run (the app reads the file until then).
+    """
+    session.execute(
+        update(BatchMetadata)
+        .where(BatchMetadata.id == 1)
+        .values(data_version=BatchMetadata.data_version + 1)
+    )
+
+
+def sync_player_snapshots(
+    session: Session,
+    gameweek: int,
+    snapshot_date: date,
+    snapshots: dict[int, dict[str, float]],
+) -> int:
+    """
+    Append the snapshot fields of each player that changed since their latest stored value.
+    snapshots maps player_id to {field name: value} (names of SNAPSHOT_FIELDS). A second run on
+    the same date replaces that date's values. Returns the number of values written.
+    """
+    table = PlayerSnapshot.__table__
+    processors = bind_processors(session, table)
+    columns = model_columns(PlayerSnapshot)
+    value_index = columns.index("value")
+
+    written = 0
+    with session.begin():
+        # the latest stored (scaled) value of every player's fields
+        latest = {
+            (player_id, field): value
+            for player_id, field, value, _ in session.execute(
+                select(
+                    PlayerSnapshot.player_id,
+                    PlayerSnapshot.field,
+                    type_coerce(PlayerSnapshot.value, NullType()),
+                    func.max(PlayerSnapshot.snapshot_date),
+                ).group_by(PlayerSnapshot.player_id, PlayerSnapshot.field)
+            )
+        }
+
+        changed = []
+        for player_id, fields in snapshots.items():
+            for name, value in fields.items():
+                row = {
+                    "player_id": player_id,
+                    "field": SNAPSHOT_FIELDS[name],
+                    "snapshot_date": snapshot_date,
+                    "gameweek": gameweek,
+                    "value": value,
+                }
+                values = tuple(row[c] if process is None else process(row[c]) for c, process in zip(columns, processors))
+                if latest.get((player_id, row["field"])) != values[value_index]:
+                    changed.append(values)
+
+        write_changes(session, PlayerSnapshot, changed, [])
+        written = len(changed)
+
+    print(f"sync player_snapshots : {written} changed values of {len(snapshots)} players")
+    return written
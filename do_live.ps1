@@ -0,0 +1 @@
+python ffp_batch.py live
\ No newline at end of file
@@ -1,31 +1,100 @@
-from fplapi.fpl_services import fetch_fpl_bootstrap, FPLError, fetch_fpl_player_summary, fetch_fpl_fixtures, fetch_fpl_team
+import argparse
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import date
+
+# the batch writes through the "batch" engine profile (WAL etc, see database/db.py) unless
+# told otherwise - must be set before the database modules are imported
+os.environ.setdefault("FFP_DB_PROFILE", "batch")
+
+from fplapi.fpl_services import (
+    fetch_fpl_bootstrap,
+    FPLError,
+    fetch_fpl_player_summary,
+    fetch_fpl_fixtures,
+    fetch_fpl_team,
+    fetch_fpl_event_live,
+)
 from database.sync_helpers import (
-    init_db, 
-    sync_teams, 
-    sync_players, 
-    sync_player_past_fixtures, 
-    sync_player_upcoming_fixtures, 
+    init_db,
+    sync_teams,
+    sync_players,
+    sync_player_past_fixtures,
+    sync_fixtures,
     sync_player_past_seasons,
+    prune_player_rows,
     sync_team_metrics,
     sync_player_metrics,
     get_users,
-    sync_user_players
+    get_user_picks_states,
+    sync_user_picks,
+    prune_user_players,
+    get_player_history,
+    get_latest_past_seasons,
+    sync_player_live_stats,
+    get_batch_retries,
+    sync_batch_retries,
+    sync_batch_metadata,
+    sync_player_snapshots,
+    shadow_tables,
+    parse_dt,
+)
+from database.db import SessionLocal, engine
+from database.maintenance import maintain_db
+from database.export import export_db, EXPORT_FORMATS
+from database.models import (
+    Team,
+    Player,
+    PlayerDetail,
+    PlayerPastFixture,
+    Fixture,
+    PlayerPastSeason,
+    TeamMetric,
+    PlayerMetric,
 )
-from database.db import SessionLocal
-from collections import defaultdict
 
 
 """
-    This file represents the batch process for the FFP system.  
+    This file represents the batch process for the FFP system.
     - Data is collected from the FPL apis
     - Data is processed and calculated data derived
     - All data is saved to the database for use by the streamlit user web application
     - This batch should be run daily to keep the database up to date
+
+    Running without a command performs the full refresh. Each subcommand refreshes
+    only part of the database, making just the api calls it needs:
+    - bootstrap : teams and players (e.g. after the daily price change)
+    - teams     : teams only
+    - users     : user picks that may have changed, optionally for --team-ids only (e.g. after signup)
+    - fixtures  : the fixtures list and the team metrics calculated from it
+    - players   : element summaries (history, past seasons), optionally for --ids only
+    - metrics   : team and player metrics, using player history already in the database
+    - live      : poll the live gameweek stats during matches (runs until stopped)
+    - retry     : refetch only the players / users whose api calls failed in an earlier run
+    - maintenance : analyze, vacuum and checkpoint the database (also run at the end of the full refresh)
+    - export    : write the tables and metric frames to parquet / feather files for analysis
+                  (also run after every other command when FFP_EXPORT_DIR is set)
+
+    The full refresh and bootstrap also append the players' price, ownership, form, points (and,
+    when the metrics are calculated, their rating and ranks) to the PlayerSnapshots history - only the values that
+    changed since the last snapshot.
+
+    Only rows that changed are written. The changes are staged in shadow tables and published
+    together at the end of each command, so the web app never waits on the batch or sees a half
+    refreshed database.
+
+    Every completed command (except live) records the gameweek, next deadline and its run id in
+    the batch_metadata row and counts up its data_version, which the web app reads in place of
+    working the gameweek out from the data.
+
+    An api failure for a single player or user does not stop the run - the item keeps
+    its previously stored data and is queued in the batch_retry table for the retry command.
 """
-try:
-    print("init database")
-    init_db()
 
+
+def fetch_bootstrap() -> dict:
     print("get bootstrap data")
     data = fetch_fpl_bootstrap()
 
@@ -41,35 +110,82 @@ try:
     if "events" not in data:
         raise FPLError("No events in FPL bootstrap data")
 
+    return data
+
+
+def get_gameweek(data: dict) -> int:
     gameweek = 1
     for event in data["events"]:
         if event["can_manage"]:
             break
         gameweek = event["id"]
-    
+
     print(f"Gameweek is : {gameweek}")
+    return gameweek
+
+
+def sync_users(gameweek: int, team_ids: list[int] | None = None, force: bool = False):
+    """
+    Refresh the picks of every registered user (or only the given team ids).
 
+    Picks for a gameweek (and the transfers made for it) can't change once its deadline has
+    passed, so users already synced for this gameweek are skipped without calling the api
+    (unless force is set). Users whose
+    fetched picks hash is unchanged are not rewritten. Users whose picks can't be fetched are
+    queued for retry.
+    """
     print("get users")
-    user_players = []
+    prune = team_ids is None
     with SessionLocal() as db:
-        users = get_users(db)
-        for i, user in enumerate(users):
-            print(f"get user picks ({i+1}/{len(users)})")
-            user_player_data = fetch_fpl_team(user.team_id, gameweek)
-            for item in user_player_data["picks"]:
-                item["user_team_id"] = user.team_id
+        if team_ids is None:
+            team_ids = sorted({user.team_id for user in get_users(db)})
+
+    with SessionLocal() as db:
+        states = get_user_picks_states(db)
+
+        fetched = 0
+        rewritten = 0
+        failed = {}
+        for i, team_id in enumerate(team_ids):
+            state = states.get(team_id)
+            if not force and state is not None and state["gameweek"] == gameweek:
+                continue
+
+            print(f"get user picks ({i+1}/{len(team_ids)})")
+            try:
+                user_player_data = fetch_fpl_team(team_id, gameweek)
+            except FPLError as e:
+                print(f"get user picks failed with : {e}")
+                failed[team_id] = str(e)
+                continue
+            fetched += 1
+
+            if sync_user_picks(db, team_id, gameweek, user_player_data["picks"]):
+                rewritten += 1
+
+        if prune:
+            prune_user_players(db, team_ids)
+
+        sync_batch_retries(db, "user", failed, [team_id for team_id in team_ids if team_id not in failed])
+
+    print(f"user picks : {fetched} fetched, {rewritten} rewritten, {len(failed)} failed of {len(team_ids)} users")
+
 
-            user_players.extend(user_player_data["picks"])
+def calculate_team_metrics(teams: list[dict], fixture_data: list[dict]) -> tuple[dict, list[dict]]:
+    """
+    Calculate home/away attack and defence strength from the last 3 home and away games of each team.
 
+    Returns (team_metrics_lookup, team_metrics_db) - the lookup is keyed by team id for
+    quick use in the player calcs, the list holds the rows to store in the db.
+    """
     print("get team fixture data to calculate strength home and away")
     team_metrics_lookup = {} # used for quick lookup in player calcs
     team_metrics_db = [] # stored in db
-    fixture_data = fetch_fpl_fixtures()
     for i, fixture in enumerate(reversed(fixture_data)):
         print(f"calculate team metrics ({i+1}/{len(fixture_data)})")
         if not fixture["finished"]:
             continue
-        
+
         if fixture["team_a"] not in team_metrics_lookup:
             team_metric = {
                 "team_id": fixture["team_a"],
@@ -141,8 +257,8 @@ try:
         away_gc_min = 0
         away_gc_max = 0
 
-    for i, team in enumerate(data["teams"]):
-        print(f"processing team ({i+1}/{len(data['teams'])}) {team['name']}")
+    for i, team in enumerate(teams):
+        print(f"processing team ({i+1}/{len(teams)}) {team['name']}")
 
         # calculate team metrics where we have games for the team available (wont be there for start of season)
         if team["id"] in team_metrics_lookup:
@@ -174,134 +290,119 @@ try:
 
             team_metrics_db.append(tm)
 
-    # initialise lists for full player details
-    past_fixtures = []
-    upcoming_fixtures = []
-    past_seasons = []
-
-    player_metrics = []
-
-    # Build player lookup for element_type (used for position ranking)
-    player_lookup = {p['id']: p for p in data["elements"]}
-
-    for i, player in enumerate(data["elements"]):
-        print(f"processing player ({i+1}/{len(data['elements'])}) {player['first_name']} {player['second_name']}")
-        # call api to get player summary
-        player_data = fetch_fpl_player_summary(player['id'])
-
-        # add player_id to lists where we dont have it
-        for item in player_data["fixtures"]:
-            item["player_id"] = player['id']
-
-        for item in player_data["history_past"]:
-            item["player_id"] = player['id']
-
-        # append player data to full player lists for saving to db
-        past_fixtures.extend(player_data["history"])
-        upcoming_fixtures.extend(player_data["fixtures"])
-        past_seasons.extend(player_data["history_past"])
-
-        # calculate player metrics
-        points_last_3_games = 0
-        starts = 0
-        starter_minutes = 0
-        games_played_last_3_gw = 0
+    return team_metrics_lookup, team_metrics_db
+
+
+def calculate_player_metric(
+    player: dict,
+    history: list[dict],
+    fixtures: list[dict],
+    gameweek: int,
+    team_metrics_lookup: dict,
+) -> dict:
+    """
+    Calculate the metrics for a single player from their past games (oldest first)
+    and upcoming fixtures (soonest first).
+    """
+    points_last_3_games = 0
+    starts = 0
+    starter_minutes = 0
+    games_played_last_3_gw = 0
+
+    last_3_count = 0
+
+    # Determine which gameweeks count as "last 3" (e.g., if GW=12, then GW 10, 11, 12)
+    min_gw_for_last_3 = max(1, gameweek - 2)
+
+    # calculate metrics for historic games in reverse order or being player
+    for f, fixture in enumerate(reversed(history)):
+        # FPL sometimes provides unset data when in middle of game week, so ignore for calcs
+        if fixture['total_points'] is None or fixture['minutes'] is None or fixture['starts'] is None:
+            continue
 
-        last_3_count = 0
+        if last_3_count < 3:
+            last_3_count += 1
+            points_last_3_games += fixture['total_points']
 
-        # Determine which gameweeks count as "last 3" (e.g., if GW=12, then GW 10, 11, 12)
-        min_gw_for_last_3 = max(1, gameweek - 2)
+        # Only count games played in the actual last 3 gameweeks for the factor
+        fixture_round = fixture.get('round', 0)
+        if fixture_round >= min_gw_for_last_3 and fixture['minutes'] > 0:
+            games_played_last_3_gw += 1
 
-        # calculate metrics for historic games in reverse order or being player
-        for f, fixture in enumerate(reversed(player_data["history"])):
-            # FPL sometimes provides unset data when in middle of game week, so ignore for calcs
-            if fixture['total_points'] is None or fixture['minutes'] is None or fixture['starts'] is None:
-                continue
+        if fixture['starts'] == 1:
+            starts += 1
+            starter_minutes += fixture['minutes']
 
-            if last_3_count < 3:
-                last_3_count += 1
-                points_last_3_games += fixture['total_points']
+    average_points_last_3_games = 0 if last_3_count == 0 else points_last_3_games / last_3_count
 
-            # Only count games played in the actual last 3 gameweeks for the factor
-            fixture_round = fixture.get('round', 0)
-            if fixture_round >= min_gw_for_last_3 and fixture['minutes'] > 0:
-                games_played_last_3_gw += 1
+    min_per_90 = 0 if starter_minutes == 0 else starter_minutes / starts
+    early_sub = min_per_90 < 60
 
-            if fixture['starts'] == 1:
-                starts += 1
-                starter_minutes += fixture['minutes']
+    # Calculate games played factor: games where player got minutes / gameweeks available (max 3)
+    # Uses the season gameweek to determine how many gameweeks have occurred
+    available_gameweeks = min(gameweek, 3)
+    if available_gameweeks == 0:
+        games_played_factor = 1.0
+    else:
+        games_played_factor = games_played_last_3_gw / available_gameweeks
+
+    # calculate metrics for upcoming games
+    no_future_games = 0
+    total_difficulty_next_3 = 0
+    for f, fixture in enumerate(fixtures):
+        no_future_games += 1
+        opposing_team = fixture["team_a"] if fixture["is_home"] else fixture["team_h"]
+
+        if player["element_type"] in [1, 2]: # GK and def
+            if fixture["is_home"]:
+                total_difficulty_next_3 += team_metrics_lookup[opposing_team]["away_strength_attack"]
+            else:
+                total_difficulty_next_3 += team_metrics_lookup[opposing_team]["home_strength_attack"]
+        else: # mid or attack
+            if fixture["is_home"]:
+                total_difficulty_next_3 += team_metrics_lookup[opposing_team]["away_strength_defence"]
+            else:
+                total_difficulty_next_3 += team_metrics_lookup[opposing_team]["home_strength_defence"]
 
-        average_points_last_3_games = 0 if last_3_count == 0 else points_last_3_games / last_3_count
+        if f >= 2: # only need to look at next 3 games
+            break
 
-        min_per_90 = 0 if starter_minutes == 0 else starter_minutes / starts
-        early_sub = min_per_90 < 60
+    average_difficulty_next_3 = 0 if no_future_games == 0 else total_difficulty_next_3 / no_future_games
+
+    # Calculate base selection likelihood from status
+    if player['status'] == 'i' or player['status'] == 's': # i = injured s = suspended
+        base_selection_likelihood = 0
+    elif player['status'] == 'd' and early_sub: # doubtful
+        base_selection_likelihood = 50
+    elif player['status'] == 'd': # doubtful
+        base_selection_likelihood = 67
+    elif player['status'] == 'a' and early_sub: # available
+        base_selection_likelihood = 80
+    else:
+        base_selection_likelihood = 95
 
-        # Calculate games played factor: games where player got minutes / gameweeks available (max 3)
-        # Uses the season gameweek to determine how many gameweeks have occurred
-        available_gameweeks = min(gameweek, 3)
-        if available_gameweeks == 0:
-            games_played_factor = 1.0
-        else:
-            games_played_factor = games_played_last_3_gw / available_gameweeks
-
-        # calculate metrics for upcoming games
-        no_future_games = 0
-        total_difficulty_next_3 = 0
-        for f, fixture in enumerate(player_data["fixtures"]):
-            no_future_games += 1
-            opposing_team = fixture["team_a"] if fixture["is_home"] else fixture["team_h"]
-
-            if player["element_type"] in [1, 2]: # GK and def
-                if fixture["is_home"]:
-                    total_difficulty_next_3 += team_metrics_lookup[opposing_team]["away_strength_attack"]
-                else:
-                    total_difficulty_next_3 += team_metrics_lookup[opposing_team]["home_strength_attack"]
-            else: # mid or attack
-                if fixture["is_home"]:
-                    total_difficulty_next_3 += team_metrics_lookup[opposing_team]["away_strength_defence"]
-                else:
-                    total_difficulty_next_3 += team_metrics_lookup[opposing_team]["home_strength_defence"]
-
-            if f >= 2: # only need to look at next 3 games
-                break
+    # Apply games played factor to selection likelihood
+    selection_likelihood = int(base_selection_likelihood * games_played_factor)
 
-        average_difficulty_next_3 = 0 if no_future_games == 0 else total_difficulty_next_3 / no_future_games
-
-        # Calculate base selection likelihood from status
-        if player['status'] == 'i' or player['status'] == 's': # i = injured s = suspended
-            base_selection_likelihood = 0
-        elif player['status'] == 'd' and early_sub: # doubtful
-            base_selection_likelihood = 50
-        elif player['status'] == 'd': # doubtful
-            base_selection_likelihood = 67
-        elif player['status'] == 'a' and early_sub: # available
-            base_selection_likelihood = 80
-        else:
-            base_selection_likelihood = 95
-
-        # Apply games played factor to selection likelihood
-        selection_likelihood = int(base_selection_likelihood * games_played_factor)
-
-        player_metric = {
-            "player_id": player['id'],
-            "total_points_per_pound": player['total_points'] / player['now_cost'],
-            "points_last_3_games": points_last_3_games,
-            'points_per_pound_last_3_games': points_last_3_games / player['now_cost'],
-            'min_per_90': min_per_90,
-            'early_sub': early_sub,
-            "selection_likelihood": selection_likelihood,
-            "games_played_factor": games_played_factor,
-            "team_difficulty_next_3": average_difficulty_next_3,
-        }
+    player_metric = {
+        "player_id": player['id'],
+        "total_points_per_pound": player['total_points'] / player['now_cost'],
+        "points_last_3_games": points_last_3_games,
+        'points_per_pound_last_3_games': points_last_3_games / player['now_cost'],
+        'min_per_90': min_per_90,
+        'early_sub': early_sub,
+        "selection_likelihood": selection_likelihood,
+        "games_played_factor": games_played_factor,
+        "team_difficulty_next_3": average_difficulty_next_3,
+    }
 
-        player_metric["player_rating"] = (selection_likelihood * player_metric['points_per_pound_last_3_games']) / average_difficulty_next_3
+    player_metric["player_rating"] = (selection_likelihood * player_metric['points_per_pound_last_3_games']) / average_difficulty_next_3
 
-        player_metrics.append(player_metric)
+    return player_metric
 
-        # used for testing to reduce time
-        # if i >= 10:
-        #     break
 
+def rank_player_metrics(player_metrics: list[dict], player_lookup: dict):
+    """ Assign overall player_rank and position_rank (by element_type) from player_rating """
     # calculate overall player rank
     ordered_player_metrics = sorted(
         player_metrics,
@@ -329,17 +430,439 @@ try:
             player["position_rank"] = i + 1
 
 
-    print("save data to db")
+# players whose element summaries are fetched before their rows are written to the db
+PLAYER_WRITE_CHUNK = 50
+
+# tables loaded from the element summaries / calculated metrics, published as a group
+PLAYER_DATA_MODELS = (PlayerPastFixture, PlayerPastSeason)
+METRIC_MODELS = (TeamMetric, PlayerMetric)
+
+# time budget of the incremental vacuum at the end of a full refresh
+MAINTENANCE_VACUUM_SECONDS = 10.0
+
+# when set, every command that changes the data is followed by a columnar export to this directory
+EXPORT_DIR = os.environ.get("FFP_EXPORT_DIR")
+
+
+def sync_player_summaries(
+    players: list[dict],
+    gameweek: int,
+    team_metrics_lookup: dict | None = None,
+    player_ids: list[int] | None = None,
+) -> list[dict]:
+    """
+    Call the element-summary api for each player and save their history and past seasons (their
+    upcoming fixtures are their team's, stored once in Fixtures). Rows are written every
+    PLAYER_WRITE_CHUNK players, so only one chunk of rows is held in memory however many players
+    (or seasons of history) there are.
+
+    When team_metrics_lookup is given the (unranked) metrics of each player are calculated from
+    their summary and returned. player_ids limits the refresh to just those players.
+
+    A player whose summary can't be fetched keeps their stored rows, gets no metric and is
+    queued for retry.
+
+    Past seasons don't change during a season, so they are only written for players whose
+    latest past season differs from the stored one (players new to the game, or everyone once
+    at the start of a season). Otherwise the PlayerPastSeasons table is left untouched.
+    """
+    player_metrics = []
+    failed = {}
+
+    if player_ids is not None:
+        players = [p for p in players if p["id"] in player_ids]
+
     with SessionLocal() as db:
+        stored_seasons = get_latest_past_seasons(db)
+        past_seasons_written = 0
+
+        for chunk_start in range(0, len(players), PLAYER_WRITE_CHUNK):
+            chunk = players[chunk_start:chunk_start + PLAYER_WRITE_CHUNK]
+
+            past_fixtures = []
+            past_seasons = []
+            past_season_ids = []
+
+            for i, player in enumerate(chunk, start=chunk_start):
+                print(f"processing player ({i+1}/{len(players)}) {player['first_name']} {player['second_name']}")
+                # call api to get player summary
+                try:
+                    player_data = fetch_fpl_player_summary(player['id'])
+                except FPLError as e:
+                    print(f"get player summary failed with : {e}")
+                    failed[player['id']] = str(e)
+                    continue
+
+                # add player_id to lists where we dont have it
+                for item in player_data["history_past"]:
+                    item["player_id"] = player['id']
+
+                # append player data to the chunk lists for saving to db
+                past_fixtures.extend(player_data["history"])
+
+                latest_season = max((s["season_name"] for s in player_data["history_past"]), default=None)
+                if stored_seasons.get(player['id']) != latest_season:
+                    past_seasons.extend(player_data["history_past"])
+                    past_season_ids.append(player['id'])
+
+                if team_metrics_lookup is not None:
+                    player_metrics.append(
+                        calculate_player_metric(
+                            player,
+                            player_data["history"],
+                            player_data["fixtures"],
+                            gameweek,
+                            team_metrics_lookup,
+                        )
+                    )
+
+            # replace just this chunk's (fetched) players, then let the rows go
+            chunk_ids = [p['id'] for p in chunk if p['id'] not in failed]
+            sync_player_past_fixtures(db, past_fixtures, player_ids=chunk_ids)
+            if past_season_ids:
+                sync_player_past_seasons(db, past_seasons, player_ids=past_season_ids)
+                past_seasons_written += len(past_season_ids)
+
+        print(f"past seasons : {past_seasons_written} players written of {len(players)}")
+        sync_batch_retries(db, "player", failed, [p['id'] for p in players if p['id'] not in failed])
+
+    return player_metrics
+
+
+def calculate_player_metrics(
+    players: list[dict],
+    histories: dict,
+    gameweek: int,
+    team_metrics_lookup: dict,
+) -> list[dict]:
+    """
+    Calculate and rank the metrics for every player that has history available.
+    histories maps player id to a dict holding "history" and "fixtures" lists.
+    """
+    player_metrics = []
+
+    # Build player lookup for element_type (used for position ranking)
+    player_lookup = {p['id']: p for p in players}
+
+    for player in players:
+        if player['id'] not in histories:
+            continue
+
+        player_history = histories[player['id']]
+        player_metrics.append(
+            calculate_player_metric(
+                player,
+                player_history["history"],
+                player_history["fixtures"],
+                gameweek,
+                team_metrics_lookup,
+            )
+        )
+
+    rank_player_metrics(player_metrics, player_lookup)
+    return player_metrics
+
+
+def player_snapshots(players: list[dict], player_metrics: list[dict] | None = None) -> dict[int, dict[str, float]]:
+    """ The snapshot fields of each player (and their metric ranks, when given), for sync_player_snapshots """
+    snapshots = {
+        player['id']: {
+            "now_cost": player['now_cost'],
+            "selected_by_percent": float(player['selected_by_percent']),
+            "form": float(player['form']),
+            "total_points": player['total_points'],
+            "points_per_game": float(player['points_per_game']),
+        }
+        for player in players
+    }
+    for pm in player_metrics or []:
+        if pm["player_id"] in snapshots:
+            snapshots[pm["player_id"]].update(
+                player_rating=pm["player_rating"],
+                player_rank=pm["player_rank"],
+                position_rank=pm["position_rank"],
+            )
+    return snapshots
+
+
+# returned by a command that found nothing to do - no run is recorded, so the data_version (and
+# the app's read replicas) stay as they are
+NO_CHANGES = object()
+
+
+def run_all(args):
+    data = fetch_bootstrap()
+    gameweek = get_gameweek(data)
+
+    sync_users(gameweek)
+
+    fixture_data = fetch_fpl_fixtures()
+    team_metrics_lookup, team_metrics_db = calculate_team_metrics(data["teams"], fixture_data)
+
+    # everything below is staged in shadow tables and published together at the end
+    with SessionLocal() as swap_db, shadow_tables(swap_db, Team, Player, PlayerDetail, Fixture, *PLAYER_DATA_MODELS, *METRIC_MODELS):
+        player_metrics = sync_player_summaries(data["elements"], gameweek, team_metrics_lookup)
+
+        with SessionLocal() as db:
+            retries = get_batch_retries(db)
+
+        if retries.get("player"):
+            # players whose summary failed keep a metric, calculated from their stored history
+            failed_ids = set(retries["player"])
+            with SessionLocal() as db:
+                histories = get_player_history(db)
+            for player in data["elements"]:
+                if player['id'] in failed_ids and player['id'] in histories:
+                    player_metrics.append(
+                        calculate_player_metric(
+                            player,
+                            histories[player['id']]["history"],
+                            histories[player['id']]["fixtures"],
+                            gameweek,
+                            team_metrics_lookup,
+                        )
+                    )
+
+        rank_player_metrics(player_metrics, {p['id']: p for p in data["elements"]})
+
+        print("save data to db")
+        with SessionLocal() as db:
+            sync_teams(db, data["teams"])
+            sync_players(db, data["elements"])
+            sync_fixtures(db, fixture_data)
+            prune_player_rows(db, [p['id'] for p in data["elements"]])
+            sync_team_metrics(db, team_metrics_db)
+            sync_player_metrics(db, player_metrics)
+
+    with SessionLocal() as db:
+        sync_player_snapshots(db, gameweek, date.today(), player_snapshots(data["elements"], player_metrics))
+
+    maintain_db(engine, MAINTENANCE_VACUUM_SECONDS)
+
+    if retries:
+        print(f"failed api calls queued for retry : {', '.join(f'{len(ids)} {kind}' for kind, ids in retries.items())}")
+        print("run 'python ffp_batch.py retry' to refetch just those")
+
+    return data
+
+
+def run_bootstrap(args):
+    data = fetch_bootstrap()
+
+    print("save data to db")
+    with SessionLocal() as db, shadow_tables(db, Team, Player, PlayerDetail):
         sync_teams(db, data["teams"])
         sync_players(db, data["elements"])
-        sync_player_past_fixtures(db, past_fixtures)
-        sync_player_upcoming_fixtures(db, upcoming_fixtures)
-        sync_player_past_seasons(db, past_seasons)
+
+    with SessionLocal() as db:
+        sync_player_snapshots(db, get_gameweek(data), date.today(), player_snapshots(data["elements"]))
+
+    return data
+
+
+def run_teams(args):
+    data = fetch_bootstrap()
+
+    print("save data to db")
+    with SessionLocal() as db, shadow_tables(db, Team):
+        sync_teams(db, data["teams"])
+
+    return data
+
+
+def run_users(args):
+    data = fetch_bootstrap()
+    gameweek = get_gameweek(data)
+
+    # explicitly requested users (e.g. after signup) are always refetched
+    sync_users(gameweek, args.team_ids, force=args.force or bool(args.team_ids))
+
+    return data
+
+
+def run_fixtures(args):
+    data = fetch_bootstrap()
+
+    fixture_data = fetch_fpl_fixtures()
+    team_metrics_lookup, team_metrics_db = calculate_team_metrics(data["teams"], fixture_data)
+
+    print("save data to db")
+    with SessionLocal() as db, shadow_tables(db, Fixture, TeamMetric):
+        sync_fixtures(db, fixture_data)
+        sync_team_metrics(db, team_metrics_db)
+
+    return data
+
+
+def run_players(args):
+    data = fetch_bootstrap()
+    gameweek = get_gameweek(data)
+
+    with SessionLocal() as db, shadow_tables(db, *PLAYER_DATA_MODELS):
+        sync_player_summaries(data["elements"], gameweek, player_ids=args.ids)
+
+        if not args.ids:
+            prune_player_rows(db, [p['id'] for p in data["elements"]])
+
+    return data
+
+
+def run_metrics(args):
+    data = fetch_bootstrap()
+    gameweek = get_gameweek(data)
+
+    recalculate_metrics(data, gameweek)
+
+    return data
+
+
+def recalculate_metrics(data: dict, gameweek: int):
+    """ Recalculate and save the team and player metrics, using the player history stored in the db """
+    fixture_data = fetch_fpl_fixtures()
+    team_metrics_lookup, team_metrics_db = calculate_team_metrics(data["teams"], fixture_data)
+
+    with SessionLocal() as db:
+        histories = get_player_history(db)
+
+    player_metrics = calculate_player_metrics(data["elements"], histories, gameweek, team_metrics_lookup)
+
+    print("save data to db")
+    with SessionLocal() as db, shadow_tables(db, *METRIC_MODELS):
         sync_team_metrics(db, team_metrics_db)
         sync_player_metrics(db, player_metrics)
-        sync_user_players(db,user_players)
-        pass
-        
-except Exception as e:
-    print(f"Failed with : {e}")
+
+    with SessionLocal() as db:
+        sync_player_snapshots(db, gameweek, date.today(), player_snapshots(data["elements"], player_metrics))
+
+
+def run_retry(args):
+    with SessionLocal() as db:
+        retries = get_batch_retries(db)
+
+    if not retries:
+        print("nothing queued for retry")
+        return NO_CHANGES
+
+    data = fetch_bootstrap()
+    gameweek = get_gameweek(data)
+
+    if retries.get("user"):
+        sync_users(gameweek, retries["user"], force=True)
+
+    if retries.get("player"):
+        # players no longer in the game can't be fetched, so drop them from the queue
+        current_ids = {p['id'] for p in data["elements"]}
+        with SessionLocal() as db:
+            sync_batch_retries(db, "player", {}, [i for i in retries["player"] if i not in current_ids])
+
+        # published before the metrics are recalculated from them
+        with SessionLocal() as db, shadow_tables(db, *PLAYER_DATA_MODELS):
+            sync_player_summaries(data["elements"], gameweek, player_ids=retries["player"])
+        recalculate_metrics(data, gameweek)
+
+    return data
+
+
+def run_maintenance(args):
+    maintain_db(engine, args.vacuum_seconds)
+
+
+def run_export(args):
+    export_db(engine, args.out, args.format)
+
+
+def run_live(args):
+    gameweek = args.gameweek or get_gameweek(fetch_bootstrap())
+
+    with SessionLocal() as db:
+        while True:
+            try:
+                live_data = fetch_fpl_event_live(gameweek)
+                sync_player_live_stats(db, gameweek, live_data["elements"])
+            except FPLError as e:
+                # a failed poll is retried on the next interval
+                print(f"live poll failed with : {e}")
+
+            if args.once:
+                break
+            time.sleep(args.interval)
+
+
+def record_run(run_id: str, data: dict | None):
+    """ Record the completed command in batch_metadata, with the gameweek of the bootstrap data it used """
+    gameweek = next_gameweek = next_deadline = None
+    if data is not None:
+        gameweek = get_gameweek(data)
+        next_event = next((event for event in data["events"] if event["can_manage"]), None)
+        if next_event is not None:
+            next_gameweek = next_event["id"]
+            next_deadline = parse_dt(next_event["deadline_time"])
+
+    with SessionLocal() as db:
+        sync_batch_metadata(db, run_id, gameweek, next_gameweek, next_deadline)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FFP batch - refresh the database from the FPL apis")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("all", help="full refresh (default)").set_defaults(func=run_all)
+    subparsers.add_parser("bootstrap", help="refresh teams and players").set_defaults(func=run_bootstrap)
+    subparsers.add_parser("teams", help="refresh teams").set_defaults(func=run_teams)
+
+    users_parser = subparsers.add_parser("users", help="refresh user picks")
+    users_parser.add_argument("--team-ids", type=int, nargs="+", help="only refresh these FPL team ids")
+    users_parser.add_argument("--force", action="store_true", help="refetch picks even if already synced for the gameweek")
+    users_parser.set_defaults(func=run_users)
+
+    subparsers.add_parser("fixtures", help="refresh fixtures and the team metrics").set_defaults(func=run_fixtures)
+
+    players_parser = subparsers.add_parser("players", help="refresh player history and past seasons")
+    players_parser.add_argument("--ids", type=int, nargs="+", help="only refresh these player ids")
+    players_parser.set_defaults(func=run_players)
+
+    subparsers.add_parser("metrics", help="recalculate team and player metrics").set_defaults(func=run_metrics)
+
+    subparsers.add_parser("retry", help="refetch only the players and users that failed in an earlier run").set_defaults(func=run_retry)
+
+    maintenance_parser = subparsers.add_parser("maintenance", help="analyze, vacuum and checkpoint the database (run after all)")
+    maintenance_parser.add_argument(
+        "--vacuum-seconds", type=float, default=MAINTENANCE_VACUUM_SECONDS, help="time budget of the incremental vacuum"
+    )
+    maintenance_parser.set_defaults(func=run_maintenance)
+
+    export_parser = subparsers.add_parser("export", help="export the tables and metric frames to parquet / feather files")
+    export_parser.add_argument("--out", default=EXPORT_DIR or "export", help="directory of the export (default $FFP_EXPORT_DIR or ./export)")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet", help="file format")
+    export_parser.set_defaults(func=run_export)
+
+    live_parser = subparsers.add_parser("live", help="poll live gameweek points into PlayerLiveStats")
+    live_parser.add_argument("--gameweek", type=int, help="gameweek to poll (default current)")
+    live_parser.add_argument("--interval", type=int, default=60, help="seconds between polls")
+    live_parser.add_argument("--once", action="store_true", help="poll once and exit")
+    live_parser.set_defaults(func=run_live)
+
+    parser.set_defaults(func=run_all)
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+    try:
+        print("init database")
+        init_db()
+
+        run_id = uuid.uuid4().hex
+        data = args.func(args)
+
+        # live polls, maintenance and exports don't change the batch's data
+        if args.func not in (run_live, run_maintenance, run_export) and data is not NO_CHANGES:
+            record_run(run_id, data)
+            if EXPORT_DIR:
+                export_db(engine, EXPORT_DIR)
+    except Exception as e:
+        print(f"Failed with : {e}")
+
+
+if __name__ == "__main__":
+    main()
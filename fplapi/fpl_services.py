@@ -1,6 +1,8 @@
+import os
 import requests
 
-FPL_BASE_URL = "https://fantasy.premierleague.com/api"
+# can be pointed at a local stand-in server (e.g. for testing the live poller)
+FPL_BASE_URL = os.environ.get("FPL_BASE_URL", "https://fantasy.premierleague.com/api")
 
 class FPLError(RuntimeError):
     """ Raised when the FPL API call fails or returns unexpected data """
@@ -95,6 +97,34 @@ def fetch_fpl_player_summary(player_id: int) -> dict:
 
     return data
 
+def fetch_fpl_event_live(gameweek: int) -> dict:
+    """
+    Fetch the live stats of every player for a gameweek. Updated by FPL during matches.
+    """
+    if gameweek <= 0:
+        raise ValueError("gameweek must be a positive integer")
+
+    url = f"{FPL_BASE_URL}/event/{gameweek}/live/"
+
+    try:
+        resp = requests.get(url)
+        resp.raise_for_status()
+        data = resp.json()
+    except requests.exceptions.HTTPError as e:
+        raise FPLError(f"FPL HTTP error: {e}") from e
+    except requests.exceptions.RequestException as e:
+        raise FPLError(f"FPL request failed: {e}") from e
+    except ValueError as e:
+        # .json() parse error
+        raise FPLError("FPL response was not valid JSON") from e
+
+    # Sanity check (live endpoint returns a dict of elements)
+    if not isinstance(data, dict) or "elements" not in data:
+        raise FPLError("FPL event live response shape unexpected (missing 'elements')")
+
+    return data
+
+
 def fetch_fpl_team(entry_id: int, gameweek: int) -> dict:
     """
     Fetch a team's picks for a specific gameweek using their FPL entry ID.
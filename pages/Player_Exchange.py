@@ -190,20 +190,20 @@ with st.expander(f"Search {selected_player['pos_type']}s to Compare with {select
 
     # Search players
     with st.spinner("Searching players..."):
-        players = search_players(
+        # Top 20 players by position rank
+        display_players, total_players = search_players(
             positions=[position_id],
             team_ids=team_ids,
             min_price=min_price,
-            max_price=max_price
+            max_price=max_price,
+            limit=20,
+            with_total=True
         )
 
-    if not players:
+    if not display_players:
         st.info("No players found matching your criteria.")
     else:
-        st.markdown(f"**Search Results ({len(players)} players)**")
-
-        # Limit to top 20 players
-        display_players = players[:20]
+        st.markdown(f"**Search Results ({total_players} players)**")
 
         # Header row
         header_cols = st.columns([1, 3, 2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5, 2])
@@ -235,8 +235,8 @@ with st.expander(f"Search {selected_player['pos_type']}s to Compare with {select
                     add_to_comparison(player_id)
                     st.rerun()
 
-        if len(players) > 20:
-            st.caption(f"Showing top 20 of {len(players)} players by position rank")
+        if total_players > 20:
+            st.caption(f"Showing top 20 of {total_players} players by position rank")
 
 # Section 3: Comparison
 with st.expander("Player Comparison", expanded=True):
@@ -83,14 +83,24 @@ with col4:
 if min_price > max_price:
     min_price, max_price = max_price, min_price
 
-# Search for players
-players = search_players(
+# Search for one page of players, by position rank
+page_size = 50
+page = st.session_state.get("lookup_page", 1)
+players, total_players = search_players(
     positions=positions,
     team_ids=team_ids,
     min_price=min_price,
-    max_price=max_price
+    max_price=max_price,
+    limit=page_size,
+    offset=(page - 1) * page_size,
+    with_total=True
 )
 
+if not players and total_players:
+    # the filters changed to fewer pages than the one shown
+    st.session_state.lookup_page = 1
+    st.rerun()
+
 if not players:
     st.info("No players found with the selected filters.")
     st.stop()
@@ -98,10 +108,9 @@ if not players:
 # Check if we have a selected player
 if st.session_state.lookup_selected_player_id is None:
     # Show player list with select buttons
-    st.subheader(f"Players ({len(players)})")
+    st.subheader(f"Players ({total_players})")
 
-    # Limit display to top 50 by position rank
-    display_players = players[:50]
+    display_players = players
 
     # Header row
     header_cols = st.columns([1, 3, 2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 2])
@@ -127,8 +136,11 @@ if st.session_state.lookup_selected_player_id is None:
             select_player(player["player_id"])
             st.rerun()
 
-    if len(players) > 50:
-        st.caption(f"Showing top 50 of {len(players)} players by position rank")
+    if total_players > page_size:
+        pages = (total_players + page_size - 1) // page_size
+        st.number_input("Page", min_value=1, max_value=pages, step=1, key="lookup_page")
+        first = (page - 1) * page_size + 1
+        st.caption(f"Showing {first}-{first + len(players) - 1} of {total_players} players by position rank")
 
     st.stop()
 
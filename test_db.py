@@ -0,0 +1,41 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import text
+
+from database.db import POOL_METRICS, POOL_PROFILES, create_db_engine
+
+
+class TestPools(unittest.TestCase):
+    @mock.patch.dict(POOL_PROFILES, {"single": {"pool_size": 1, "max_overflow": 0, "pool_timeout": 5}})
+    def test_checkout_wait_recorded(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_db_engine(f"sqlite:///{db_dir}/pool.db", "default", "single", "test_single")
+            held = threading.Event()
+
+            def hold_connection():
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    held.set()
+                    time.sleep(0.2)
+
+            thread = threading.Thread(target=hold_connection)
+            thread.start()
+            held.wait()
+            # the only connection is checked out, so this waits for the thread to return it
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            thread.join()
+            engine.dispose()
+
+        metrics = POOL_METRICS.pop("test_single").snapshot()
+        self.assertEqual(metrics["checkouts"], 2)
+        self.assertEqual(metrics["pool_size"], 1)
+        self.assertGreater(metrics["max_wait_ms"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import export
+from database.db import Base, use_sqlite_transactions
+from database.export import export_db
+from database.models import PlayerLiveStat
+from database.sync_helpers import sync_rows
+
+
+def live_stat(player_id: int, event: int, total_points: int) -> dict:
+    return {
+        "player_id": player_id, "event": event, "minutes": 90, "goals_scored": 0, "assists": 0,
+        "clean_sheets": 0, "goals_conceded": 0, "saves": 0, "yellow_cards": 0, "red_cards": 0,
+        "bonus": 0, "bps": 0, "total_points": total_points,
+    }
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "the export needs pyarrow")
+class TestExport(unittest.TestCase):
+    def test_incremental_partitioned_export(self):
+        import pyarrow.dataset as ds
+
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/export.db")
+            use_sqlite_transactions(engine)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+            out_dir = os.path.join(db_dir, "export")
+
+            with Session() as db:
+                sync_rows(db, PlayerLiveStat, [live_stat(1, 1, 2), live_stat(2, 1, 6), live_stat(3, 2, 3)])
+            first = export_db(engine, out_dir)
+            unchanged = export_db(engine, out_dir)
+
+            # only the changed and new gameweeks' files are written, the emptied one removed
+            with Session() as db:
+                sync_rows(db, PlayerLiveStat, [live_stat(3, 2, 9), live_stat(4, 3, 1)])
+            changed = export_db(engine, out_dir)
+
+            live = ds.dataset(os.path.join(out_dir, "PlayerLiveStats"), format="parquet", partitioning="hive").to_table()
+            exported = sorted(zip(*(live[c].to_pylist() for c in ("event", "player_id", "total_points"))))
+            # credentials and bookkeeping stay in the database
+            excluded_exported = [
+                name for name in ("Users", "batch_metadata", "user_picks_state")
+                if os.path.exists(os.path.join(out_dir, name))
+            ]
+            engine.dispose()
+
+        self.assertEqual(first["written"], unchanged["unchanged"])
+        self.assertEqual(unchanged["written"], 0)
+        self.assertEqual((changed["written"], changed["removed"]), (2, 1))
+        self.assertEqual(exported, [(2, 3, 9), (3, 4, 1)])
+        self.assertEqual(excluded_exported, [])
+
+    def test_earlier_season_kept(self):
+        import pyarrow.dataset as ds
+
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/export.db")
+            use_sqlite_transactions(engine)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+            out_dir = os.path.join(db_dir, "export")
+
+            with Session() as db:
+                sync_rows(db, PlayerLiveStat, [live_stat(1, 38, 5)])
+            with mock.patch.object(export, "current_season", return_value="2025-26"):
+                export_db(engine, out_dir)
+
+            # the new season's fixtures replace the old season's rows
+            with Session() as db:
+                sync_rows(db, PlayerLiveStat, [live_stat(1, 1, 2)])
+            with mock.patch.object(export, "current_season", return_value="2026-27"):
+                rolled_over = export_db(engine, out_dir)
+                again = export_db(engine, out_dir)
+
+            live = ds.dataset(os.path.join(out_dir, "PlayerLiveStats"), format="parquet", partitioning="hive").to_table()
+            exported = sorted(zip(*(live[c].to_pylist() for c in ("season", "event", "total_points"))))
+            engine.dispose()
+
+        self.assertEqual(rolled_over["removed"], 0)
+        self.assertEqual(again["written"], 0)
+        self.assertEqual(exported, [("2025-26", 38, 5), ("2026-27", 1, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
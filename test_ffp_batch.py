@@ -0,0 +1,132 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic_fpl import SyntheticConfig, SyntheticFPL
+from database.db import Base, use_sqlite_transactions
+from database.models import BatchMetadata, PlayerPastSeason, User
+from database.sync_helpers import sync_batch_retries
+
+# after the database modules - the batch sets its engine profile when they are first imported
+import ffp_batch
+
+
+class TestBatchCommands(unittest.TestCase):
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.db_dir.name}/batch.db")
+        use_sqlite_transactions(self.engine)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        # the fetch functions are swapped for the synthetic generator, as in the batch benchmark
+        self.synthetic = SyntheticFPL(SyntheticConfig(players=30, fixtures_per_player=3, upcoming_per_player=2, past_seasons=1, users=2))
+        self.fetched_players = []
+        self.fetched_teams = []
+
+        def fetch_player_summary(player_id):
+            self.fetched_players.append(player_id)
+            return self.synthetic.fetch_fpl_player_summary(player_id)
+
+        def fetch_team(team_id, gameweek):
+            self.fetched_teams.append(team_id)
+            return self.synthetic.fetch_fpl_team(team_id, gameweek)
+
+        self.patches = contextlib.ExitStack()
+        for name, value in [
+            ("SessionLocal", self.Session),
+            ("init_db", mock.Mock()),
+            ("fetch_fpl_bootstrap", self.synthetic.fetch_fpl_bootstrap),
+            ("fetch_fpl_fixtures", self.synthetic.fetch_fpl_fixtures),
+            ("fetch_fpl_player_summary", fetch_player_summary),
+            ("fetch_fpl_team", fetch_team),
+            ("EXPORT_DIR", None),
+        ]:
+            self.patches.enter_context(mock.patch.object(ffp_batch, name, value))
+        # the batch reports progress per player and user
+        devnull = self.patches.enter_context(open(os.devnull, "w"))
+        self.patches.enter_context(contextlib.redirect_stdout(devnull))
+
+    def tearDown(self):
+        self.patches.close()
+        self.engine.dispose()
+        self.db_dir.cleanup()
+
+    def data_version(self):
+        with self.Session() as db:
+            return db.scalar(select(BatchMetadata.data_version))
+
+    def test_parser(self):
+        parser = ffp_batch.build_parser()
+
+        self.assertIs(parser.parse_args([]).func, ffp_batch.run_all)
+
+        args = parser.parse_args(["players", "--ids", "1", "2"])
+        self.assertEqual((args.func, args.ids), (ffp_batch.run_players, [1, 2]))
+
+        args = parser.parse_args(["users", "--team-ids", "3", "--force"])
+        self.assertEqual((args.func, args.team_ids, args.force), (ffp_batch.run_users, [3], True))
+
+        args = parser.parse_args(["live", "--gameweek", "20", "--once"])
+        self.assertEqual((args.func, args.gameweek, args.once), (ffp_batch.run_live, 20, True))
+
+    def test_players_ids(self):
+        ffp_batch.main(["players", "--ids", "4", "7"])
+
+        with self.Session() as db:
+            past_season_players = set(db.scalars(select(PlayerPastSeason.player_id)))
+        self.assertEqual(sorted(self.fetched_players), [4, 7])
+        self.assertEqual(past_season_players, {4, 7})
+        self.assertEqual(self.data_version(), 1)
+
+    def test_users_team_ids_and_force(self):
+        with self.Session() as db:
+            db.add(User(email="user@test.local", password_hash="-", name="user", team_id=3))
+            db.commit()
+
+        ffp_batch.main(["users"])
+        # picks already synced for the gameweek aren't refetched ...
+        ffp_batch.main(["users"])
+        # ... unless forced, or the team ids are given
+        ffp_batch.main(["users", "--force"])
+        ffp_batch.main(["users", "--team-ids", "3"])
+
+        self.assertEqual(self.fetched_teams, [3, 3, 3])
+
+    def test_no_changes_records_no_run(self):
+        with mock.patch.object(ffp_batch, "record_run") as record_run:
+            # nothing queued for retry
+            ffp_batch.main(["retry"])
+            record_run.assert_not_called()
+
+            with self.Session() as db:
+                sync_batch_retries(db, "user", {3: "timeout"}, [])
+            ffp_batch.main(["retry"])
+        record_run.assert_called_once()
+        self.assertEqual(self.fetched_teams, [3])
+
+    def test_live_maintenance_export_record_no_run(self):
+        live_data = {"elements": [{"id": 1, "stats": {"minutes": 90, "total_points": 6}, "explain": []}]}
+        with mock.patch.object(ffp_batch, "record_run") as record_run, \
+                mock.patch.object(ffp_batch, "fetch_fpl_event_live", return_value=live_data) as fetch_live, \
+                mock.patch.object(ffp_batch, "sync_player_live_stats") as sync_live, \
+                mock.patch.object(ffp_batch, "maintain_db") as maintain_db, \
+                mock.patch.object(ffp_batch, "export_db") as export_db:
+            ffp_batch.main(["live", "--gameweek", "20", "--once"])
+            ffp_batch.main(["maintenance"])
+            ffp_batch.main(["export", "--out", self.db_dir.name])
+
+        fetch_live.assert_called_once_with(20)
+        sync_live.assert_called_once()
+        maintain_db.assert_called_once()
+        export_db.assert_called_once_with(ffp_batch.engine, self.db_dir.name, "parquet")
+        record_run.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
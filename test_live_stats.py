@@ -0,0 +1,124 @@
+import argparse
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database import lookup_helpers
+from database.db import Base, create_db_engine
+from database.models import PlayerLiveStat
+from database.sync_helpers import sync_player_live_stats
+from fplapi import fpl_services
+from fplapi.fpl_services import fetch_fpl_event_live
+
+# after the database modules - the batch sets its engine profile when they are first imported
+import ffp_batch
+
+
+def live_element(player_id: int, total_points: int, minutes: int = 90) -> dict:
+    stats = {
+        "minutes": minutes, "goals_scored": 0, "assists": 0, "clean_sheets": 0, "goals_conceded": 0,
+        "saves": 0, "yellow_cards": 0, "red_cards": 0, "bonus": 0, "bps": 0, "total_points": total_points,
+    }
+    return {"id": player_id, "stats": stats, "explain": []}
+
+
+class StandInFPLHandler(BaseHTTPRequestHandler):
+    """ Serves /event/{gw}/live/ from the class level live_data dict """
+    live_data = {}
+
+    def do_GET(self):
+        body = json.dumps(self.live_data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestLiveStats(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInFPLHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.base_url_patch = mock.patch.object(fpl_services, "FPL_BASE_URL", base_url)
+        self.base_url_patch.start()
+
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.db_dir.name}/live.db")
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        self.base_url_patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.engine.dispose()
+        self.db_dir.cleanup()
+
+    def test_poll_writes_only_changed_players(self):
+        StandInFPLHandler.live_data = {"elements": [live_element(1, 2), live_element(2, 6)]}
+        with self.Session() as db:
+            written = sync_player_live_stats(db, 20, fetch_fpl_event_live(20)["elements"])
+        self.assertEqual(written, 2)
+
+        StandInFPLHandler.live_data = {"elements": [live_element(1, 2), live_element(2, 9)]}
+        with self.Session() as db:
+            written = sync_player_live_stats(db, 20, fetch_fpl_event_live(20)["elements"])
+            points = dict(db.execute(select(PlayerLiveStat.player_id, PlayerLiveStat.total_points)).all())
+        self.assertEqual(written, 1)
+        self.assertEqual(points, {1: 2, 2: 9})
+
+    def test_new_gameweek_replaces_old_rows(self):
+        StandInFPLHandler.live_data = {"elements": [live_element(1, 2), live_element(2, 6)]}
+        with self.Session() as db:
+            sync_player_live_stats(db, 20, fetch_fpl_event_live(20)["elements"])
+
+        StandInFPLHandler.live_data = {"elements": [live_element(1, 0, minutes=0)]}
+        with self.Session() as db:
+            sync_player_live_stats(db, 21, fetch_fpl_event_live(21)["elements"])
+            rows = db.execute(select(PlayerLiveStat.player_id, PlayerLiveStat.event)).all()
+        self.assertEqual(rows, [(1, 21)])
+
+    def test_player_dropped_from_live_data_removed(self):
+        StandInFPLHandler.live_data = {"elements": [live_element(1, 2), live_element(2, 6)]}
+        with self.Session() as db:
+            sync_player_live_stats(db, 20, fetch_fpl_event_live(20)["elements"])
+
+        # player 2 removed from the game mid-gameweek
+        StandInFPLHandler.live_data = {"elements": [live_element(1, 5)]}
+        with self.Session() as db:
+            sync_player_live_stats(db, 20, fetch_fpl_event_live(20)["elements"])
+            points = dict(db.execute(select(PlayerLiveStat.player_id, PlayerLiveStat.total_points)).all())
+        self.assertEqual(points, {1: 5})
+
+    def test_poller_points_shown_by_app(self):
+        args = argparse.Namespace(gameweek=20, once=True, interval=0)
+        # the app reads the live points from the file the poller writes
+        app_reads = sessionmaker(bind=create_db_engine(f"sqlite:///{self.db_dir.name}/live.db", "app"))
+
+        with mock.patch.object(ffp_batch, "SessionLocal", self.Session), \
+                mock.patch.object(lookup_helpers, "FileSessionLocal", app_reads):
+            StandInFPLHandler.live_data = {"elements": [live_element(1, 2), live_element(2, 6)]}
+            ffp_batch.run_live(args)
+            first = lookup_helpers.get_live_points([1, 2], 20)
+
+            # a goal during the match
+            StandInFPLHandler.live_data = {"elements": [live_element(1, 2), live_element(2, 12)]}
+            ffp_batch.run_live(args)
+            second = lookup_helpers.get_live_points([1, 2], 20)
+
+        app_reads.kw["bind"].dispose()
+        self.assertEqual(first, {1: 2, 2: 6})
+        self.assertEqual(second, {1: 2, 2: 12})
+
+if __name__ == "__main__":
+    unittest.main()
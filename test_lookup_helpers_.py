@@ -1,5 +1,25 @@
+import json
+import re
+import tempfile
 import unittest
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import lookup_helpers
+from database.db import Base, use_sqlite_transactions
 from database.lookup_helpers import get_current_gameweek
+from database.migrations import run_migrations
+from database.models import User
+from database.sync_helpers import (
+    sync_teams, sync_players, sync_fixtures, sync_user_picks, sync_batch_metadata,
+    sync_player_snapshots,
+)
+
+# tables the lookups deliberately read whole - small lookup tables loaded into dicts
+WHOLE_TABLE_READS = {"Teams", "TeamMetric"}
 
 
 class TestLookupHelpers(unittest.TestCase):
@@ -11,9 +31,147 @@ class TestLookupHelpers(unittest.TestCase):
             print(f"Failed to get gameweek {e}")
 
 
+class TestQueryPlans(unittest.TestCase):
+    """ Runs the hot lookups against a scratch db and checks the plan of every query they make """
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.db_dir.name}/plans.db")
+        use_sqlite_transactions(self.engine)
+        Base.metadata.create_all(self.engine)
+        run_migrations(self.engine)
+        Session = sessionmaker(bind=self.engine)
+
+        with open("fpl_bootstrap_example.json", encoding="utf-8") as f:
+            bootstrap = json.load(f)
+        with open("fpl_fixtures_example.json", encoding="utf-8") as f:
+            fixtures = json.load(f)
+        elements = bootstrap["elements"][:30]
+        picks = [
+            {
+                "element": e["id"], "position": i + 1, "multiplier": 1, "is_captain": i == 0,
+                "is_vice_captain": i == 1, "element_type": e["element_type"],
+            }
+            for i, e in enumerate(elements[:15])
+        ]
+        with Session() as db:
+            sync_teams(db, bootstrap["teams"])
+            sync_players(db, elements)
+            sync_fixtures(db, fixtures)
+            db.add(User(email="plans@test.com", password_hash="-", name="plans", team_id=1))
+            db.commit()
+            sync_user_picks(db, 1, 18, picks)
+            sync_batch_metadata(db, "plans", 18, 19)
+            sync_player_snapshots(db, 17, date(2025, 12, 1), {e["id"]: {"now_cost": 50, "form": 2.5} for e in elements})
+            sync_player_snapshots(db, 18, date(2025, 12, 8), {e["id"]: {"now_cost": 51, "form": 2.5} for e in elements[:3]})
+
+        self.player_ids = [e["id"] for e in elements]
+        self.session_patch = mock.patch.object(lookup_helpers, "ReadSessionLocal", Session)
+        self.session_patch.start()
+        self.file_session_patch = mock.patch.object(lookup_helpers, "FileSessionLocal", Session)
+        self.file_session_patch.start()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        self.session_patch.stop()
+        self.file_session_patch.stop()
+        self.engine.dispose()
+        self.db_dir.cleanup()
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def assert_no_full_scans(self, listed: frozenset[str] = frozenset()):
+        """
+        Fail on a full scan of any table but WHOLE_TABLE_READS, or a sort of the rows found.
+        listed are the tables a lookup lists whole (every row is a candidate), which it may scan
+        and sort.
+        """
+        self.assertTrue(self.statements)
+        with self.engine.connect() as connection:
+            for statement, parameters in self.statements:
+                aliases = {alias: table for table, alias in re.findall(r'"?(\w+)"? AS "?(\w+)"?', statement)}
+                plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                lists = False
+                for detail in (row[3] for row in plan):
+                    # a bare scan, or a full scan through an index
+                    scan = re.match(r"^SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX \w+)?$", detail)
+                    # sqlite names an aliased table by its alias. (scans of subqueries read rows already found)
+                    table = scan and aliases.get(scan.group(1), scan.group(1))
+                    if table in listed:
+                        lists = True
+                    elif table in Base.metadata.tables and table not in WHOLE_TABLE_READS:
+                        self.fail(f"full scan of {table} in : {statement}")
+                    # a window numbers the rows it is given in its own order - the index
+                    # searches above keep those to the few it needs
+                    if " OVER (" not in statement and not lists:
+                        self.assertNotIn("TEMP B-TREE", detail, statement)
+
+    def test_gameweek_and_live_points(self):
+        self.assertEqual(lookup_helpers.get_current_gameweek(), 18)
+        self.assertEqual(lookup_helpers.get_data_version(), 1)
+        lookup_helpers.get_live_points(self.player_ids[:5], 18)
+        self.assert_no_full_scans()
+
+    def test_user_team(self):
+        lookup_helpers.get_user_team_id("plans@test.com")
+        team = lookup_helpers.get_user_team("plans@test.com")
+        self.assertEqual([p["squad_pos"] for p in team], list(range(1, 16)))
+        self.assertTrue(all(p["fix_1"] != "-" for p in team))
+        lookup_helpers.get_user_team_player_ids("plans@test.com")
+        self.assert_no_full_scans()
+
+    def test_search_players_paging(self):
+        everyone = lookup_helpers.search_players()
+        page, total = lookup_helpers.search_players(limit=10, offset=10, with_total=True)
+        self.assertEqual(page, everyone[10:20])
+        self.assertEqual(total, len(self.player_ids))
+        self.assertEqual(lookup_helpers.search_players(limit=10, offset=100, with_total=True), ([], total))
+
+        by_points = lookup_helpers.search_players(sort="total_points", descending=True, limit=5)
+        self.assertEqual(
+            [p["total_points"] for p in by_points],
+            sorted((p["total_points"] for p in everyone), reverse=True)[:5],
+        )
+
+    def test_search_players_plans(self):
+        for sort in lookup_helpers.SEARCH_SORT_KEYS:
+            lookup_helpers.search_players(sort=sort, limit=20)
+            lookup_helpers.search_players(sort=sort, descending=True, limit=20, offset=20, with_total=True)
+        lookup_helpers.search_players(positions=[2, 3], team_ids=[1, 2], min_price=4.5, max_price=9.0, with_total=True)
+        self.assert_no_full_scans(listed=frozenset({"Players"}))
+
+    def test_player_news_plans(self):
+        lookup_helpers.get_all_player_news()
+        self.assert_no_full_scans(listed=frozenset({"Players"}))
+
+    def test_player_snapshots(self):
+        ids = self.player_ids[2:4]
+        self.assertEqual(
+            lookup_helpers.get_player_snapshots(ids, date(2025, 12, 7)),
+            {ids[0]: {"now_cost": 50, "form": 2.5}, ids[1]: {"now_cost": 50, "form": 2.5}},
+        )
+        self.assertEqual(lookup_helpers.get_player_snapshots(ids)[ids[0]]["now_cost"], 51)
+
+        series = lookup_helpers.get_player_time_series(ids, "now_cost", start=date(2025, 12, 5))
+        self.assertEqual([p["value"] for p in series[ids[0]]], [50, 51])
+        self.assertEqual([p["value"] for p in series[ids[1]]], [50])
+        self.assert_no_full_scans()
+
+    def test_player_details(self):
+        lookup_helpers.get_player_details(self.player_ids[:1])
+        one_player = len(self.statements)
+        details = lookup_helpers.get_player_details(self.player_ids[:10])
+        # the same queries however many players are compared
+        self.assertEqual(len(self.statements), 2 * one_player)
+        self.assertEqual([p["player_id"] for p in details], self.player_ids[:10])
+        self.assert_no_full_scans()
+
+
 if __name__ == "__main__":
     test = TestLookupHelpers()
     data = test.test_get_gameweek()
     print("main done")
-
-
@@ -0,0 +1,37 @@
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from database.db import create_db_engine
+from database.maintenance import AUTO_VACUUM_INCREMENTAL, maintain_db
+
+
+class TestMaintenance(unittest.TestCase):
+    def test_maintain_db(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_db_engine(f"sqlite:///{db_dir}/maintain.db", "batch")
+            with engine.begin() as connection:
+                connection.execute(text("CREATE TABLE rows (id INTEGER PRIMARY KEY, value TEXT)"))
+                connection.execute(text("INSERT INTO rows VALUES (:id, :value)"), [{"id": i, "value": "x" * 200} for i in range(5000)])
+
+            # the first run switches to incremental vacuum, the second frees pages within its budget
+            maintain_db(engine)
+            with engine.begin() as connection:
+                connection.execute(text("DELETE FROM rows WHERE id % 2 = 0"))
+            report = maintain_db(engine)
+
+            with engine.connect() as connection:
+                auto_vacuum = connection.execute(text("PRAGMA auto_vacuum")).scalar()
+                analyzed = connection.execute(text("SELECT count(*) FROM sqlite_stat1")).scalar()
+            engine.dispose()
+
+        self.assertEqual(auto_vacuum, AUTO_VACUUM_INCREMENTAL)
+        self.assertGreater(analyzed, 0)
+        self.assertGreater(report["before"]["freelist_count"], 0)
+        self.assertEqual(report["after"]["freelist_count"], 0)
+        self.assertLess(report["after"]["page_count"], report["before"]["page_count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, inspect, select
+
+from database.db import Base, use_sqlite_transactions
+from database.migrations import MIGRATIONS, add_column, get_schema_version, rebuild_table, run_migrations
+from database.models import Fixture, Player, PlayerDetail, PlayerPastFixture, SchemaVersion, ScaledFloat, Team, UserPicksState, UserPlayers
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.db_dir.name}/migrate.db")
+        use_sqlite_transactions(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.db_dir.cleanup()
+
+    def test_migrations_run_once_in_order(self):
+        Base.metadata.create_all(self.engine)
+
+        self.assertEqual(run_migrations(self.engine), MIGRATIONS[-1][0])
+        self.assertEqual(run_migrations(self.engine), MIGRATIONS[-1][0])
+
+        with self.engine.connect() as connection:
+            versions = connection.scalars(select(SchemaVersion.version)).all()
+            self.assertEqual(get_schema_version(connection), MIGRATIONS[-1][0])
+        self.assertEqual(versions, [version for version, _, _ in MIGRATIONS])
+
+    def test_add_column_to_existing_table(self):
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE "Teams" (team_id INTEGER PRIMARY KEY, name VARCHAR NOT NULL)')
+            connection.exec_driver_sql("INSERT INTO \"Teams\" VALUES (1, 'Arsenal')")
+
+            add_column(connection, Team, "form")
+            # already there - nothing to do
+            add_column(connection, Team, "form")
+
+            columns = [c["name"] for c in inspect(connection).get_columns("Teams")]
+        self.assertEqual(columns, ["team_id", "name", "form"])
+
+    def test_rebuild_unquoted_table(self):
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO user_players (user_team_id, element, position, multiplier, is_captain, is_vice_captain, element_type) "
+                "VALUES (7, 10, 1, 2, 1, 0, 3)"
+            )
+            # sqlite stores lowercase names unquoted - CREATE TABLE user_players (
+            ddl = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'user_players'").scalar()
+
+            rebuild_table(connection, UserPlayers, {"multiplier": "multiplier + 1"})
+
+            rows = connection.exec_driver_sql("SELECT user_team_id, element, multiplier FROM user_players").all()
+            tables = inspect(connection).get_table_names()
+        self.assertTrue(ddl.startswith("CREATE TABLE user_players ("))
+        self.assertEqual(rows, [(7, 10, 3)])
+        self.assertNotIn("user_players__rebuild", tables)
+
+    def test_fixtures_from_player_upcoming_fixtures(self):
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE "PlayerUpcomingFixtures" (fixture_id INTEGER, player_id INTEGER, code INTEGER, '
+                "team_h INTEGER, team_h_score INTEGER, team_a INTEGER, team_a_score INTEGER, event INTEGER, "
+                "event_name VARCHAR, finished BOOLEAN, minutes INTEGER, provisional_start_time BOOLEAN, "
+                "kickoff_time DATETIME, is_home BOOLEAN, difficulty INTEGER, PRIMARY KEY (fixture_id, player_id))"
+            )
+            # fixture 1 seen by a player of each side, fixture 2 only by the home side
+            for fixture_id, player_id, is_home, difficulty in [(1, 10, 1, 2), (1, 20, 0, 4), (1, 11, 1, 2), (2, 10, 1, 3)]:
+                connection.exec_driver_sql(
+                    'INSERT INTO "PlayerUpcomingFixtures" VALUES '
+                    "(?, ?, 100, 1, NULL, 2, NULL, 19, 'Gameweek 19', 0, 0, 0, '2025-12-27 15:00:00.000000', ?, ?)",
+                    (fixture_id, player_id, is_home, difficulty),
+                )
+
+        run_migrations(self.engine)
+
+        with self.engine.connect() as connection:
+            self.assertFalse(inspect(connection).has_table("PlayerUpcomingFixtures"))
+            fixtures = connection.execute(
+                select(Fixture.fixture_id, Fixture.team_h_difficulty, Fixture.team_a_difficulty)
+            ).all()
+        self.assertEqual(fixtures, [(1, 2, 4)])
+
+    def test_past_fixture_match_facts_moved_to_fixtures(self):
+        # PlayerPastFixtures as it was - match facts on every row, float stats as REAL
+        old_columns = ["opponent_team INTEGER", "kickoff_time DATETIME", "team_h_score INTEGER", "team_a_score INTEGER"]
+        for column in PlayerPastFixture.__table__.columns:
+            old_columns.append(f"{column.name} {'FLOAT' if isinstance(column.type, ScaledFloat) else 'INTEGER'}")
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                f'CREATE TABLE "PlayerPastFixtures" ({", ".join(old_columns)}, PRIMARY KEY (fixture_id, player_id))'
+            )
+            # a home and an away player of fixture 7 (team 1 at home to team 2)
+            for player_id, opponent, was_home in [(10, 2, 1), (20, 1, 0)]:
+                connection.exec_driver_sql(
+                    'INSERT INTO "PlayerPastFixtures" (fixture_id, player_id, opponent_team, round, was_home, '
+                    "kickoff_time, team_h_score, team_a_score, total_points, influence, expected_goals) "
+                    "VALUES (7, ?, ?, 3, ?, '2025-08-30 14:00:00.000000', 2, 1, 6, 12.4, 0.57)",
+                    (player_id, opponent, was_home),
+                )
+        Base.metadata.create_all(self.engine)
+
+        run_migrations(self.engine)
+
+        with self.engine.connect() as connection:
+            columns = {c["name"] for c in inspect(connection).get_columns("PlayerPastFixtures")}
+            fixture = connection.execute(select(Fixture.team_h, Fixture.team_a, Fixture.team_h_score, Fixture.event)).one()
+            stats = connection.execute(
+                select(PlayerPastFixture.influence, PlayerPastFixture.expected_goals).where(PlayerPastFixture.player_id == 10)
+            ).one()
+            stored = connection.exec_driver_sql('SELECT typeof(influence), influence FROM "PlayerPastFixtures" LIMIT 1').one()
+
+        self.assertNotIn("opponent_team", columns)
+        self.assertEqual(tuple(fixture), (1, 2, 2, 3))
+        self.assertEqual(tuple(stats), (12.4, 0.57))
+        self.assertEqual(tuple(stored), ("integer", 124))
+
+    def test_players_split_into_details(self):
+        # Players as it was - every column of the bootstrap element
+        old_columns = [c.name for c in Player.__table__.columns] + [
+            c.name for c in PlayerDetail.__table__.columns if c.name != "player_id"
+        ]
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(f'CREATE TABLE "Players" ({", ".join(old_columns)}, PRIMARY KEY (player_id))')
+            values = {name: 0 for name in old_columns} | {
+                "player_id": 5, "web_name": "Saka", "now_cost": 101, "ep_next": 6.5, "penalties_text": "first choice",
+            }
+            connection.exec_driver_sql(
+                f'INSERT INTO "Players" ({", ".join(values)}) VALUES ({", ".join("?" * len(values))})',
+                tuple(values.values()),
+            )
+        Base.metadata.create_all(self.engine)
+
+        run_migrations(self.engine)
+
+        with self.engine.connect() as connection:
+            columns = [c["name"] for c in inspect(connection).get_columns("Players")]
+            player = connection.execute(select(Player.web_name, Player.now_cost)).one()
+            detail = connection.execute(select(PlayerDetail.player_id, PlayerDetail.ep_next, PlayerDetail.penalties_text)).one()
+
+        self.assertEqual(columns, [c.name for c in Player.__table__.columns])
+        self.assertEqual(tuple(player), ("Saka", 101))
+        self.assertEqual(tuple(detail), (5, 6.5, "first choice"))
+
+    def test_picks_state_transfers_dropped(self):
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE user_picks_state (user_team_id INTEGER PRIMARY KEY, gameweek INTEGER NOT NULL, "
+                "event_transfers INTEGER NOT NULL, picks_hash VARCHAR(64) NOT NULL)"
+            )
+            connection.exec_driver_sql("INSERT INTO user_picks_state VALUES (7, 18, 1, 'abc')")
+        Base.metadata.create_all(self.engine)
+
+        run_migrations(self.engine)
+
+        with self.engine.connect() as connection:
+            columns = [c["name"] for c in inspect(connection).get_columns("user_picks_state")]
+            state = connection.execute(select(UserPicksState.__table__)).one()
+
+        self.assertEqual(columns, ["user_team_id", "gameweek", "picks_hash"])
+        self.assertEqual(tuple(state), (7, 18, "abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import importlib.util
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import lookup_helpers
+from database.db import Base, create_db_engine
+from database.migrations import run_migrations
+from database.models import BatchMetadata, User
+from database.replica import USE_READ_REPLICA, ReadReplica, ReadSessionLocal, ReplicaSessionmaker
+from database.sync_helpers import (
+    count_data_version, sync_batch_metadata, sync_player_live_stats, sync_players, sync_teams, sync_user_picks,
+)
+
+
+def picks_of(elements: list[dict]) -> list[dict]:
+    return [
+        {
+            "element": e["id"], "position": i + 1, "multiplier": 1, "is_captain": i == 0,
+            "is_vice_captain": i == 1, "element_type": e["element_type"],
+        }
+        for i, e in enumerate(elements)
+    ]
+
+
+def live_element(player_id: int, total_points: int) -> dict:
+    stats = {
+        "minutes": 90, "goals_scored": 0, "assists": 0, "clean_sheets": 0, "goals_conceded": 0,
+        "saves": 0, "yellow_cards": 0, "red_cards": 0, "bonus": 0, "bps": 0, "total_points": total_points,
+    }
+    return {"id": player_id, "stats": stats}
+
+
+class TestReadReplica(unittest.TestCase):
+    def test_reload_on_new_data_version(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_db_engine(f"sqlite:///{db_dir}/replica.db", "batch")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+            replica = ReadReplica(create_db_engine(f"sqlite:///{db_dir}/replica.db", "app"))
+            ReadSession = ReplicaSessionmaker(replica)
+
+            # before the first batch run the file is read
+            with ReadSession() as db:
+                before_batch = db.scalar(select(BatchMetadata.current_gameweek))
+            with Session() as write_db:
+                sync_batch_metadata(write_db, "run1", 18, 19)
+
+            with ReadSession() as db:
+                first = db.scalar(select(BatchMetadata.current_gameweek))
+                # a session open across the reload keeps reading its copy
+                with Session() as write_db:
+                    sync_batch_metadata(write_db, "run2", 19, 20)
+                with ReadSession() as new_db:
+                    second = new_db.scalar(select(BatchMetadata.current_gameweek))
+                still_first = db.scalar(select(BatchMetadata.current_gameweek))
+
+            with ReadSession() as db:
+                with self.assertRaises(OperationalError):
+                    db.execute(text("DELETE FROM batch_metadata"))
+
+            data_version = replica.data_version
+            replica.close()
+            replica.source_engine.dispose()
+            engine.dispose()
+
+        self.assertIsNone(before_batch)
+        self.assertEqual((first, second, still_first), (18, 19, 18))
+        self.assertEqual(data_version, 2)
+
+    def test_lookups_not_held_by_a_load(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_db_engine(f"sqlite:///{db_dir}/replica.db", "batch")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+            with Session() as write_db:
+                sync_batch_metadata(write_db, "run1", 18, 19)
+            replica = ReadReplica(create_db_engine(f"sqlite:///{db_dir}/replica.db", "app"))
+            first_engine = replica.get_engine()
+
+            with Session() as write_db:
+                sync_batch_metadata(write_db, "run2", 19, 20)
+            # while another lookup loads the new copy the current one is read, without waiting
+            with replica._load_lock:
+                during_load = replica.get_engine()
+            after_load = replica.get_engine()
+            data_version = replica.data_version
+
+            replica.close()
+            replica.source_engine.dispose()
+            engine.dispose()
+
+        self.assertIs(during_load, first_engine)
+        self.assertIsNot(after_load, first_engine)
+        self.assertEqual(data_version, 2)
+
+
+@unittest.skipUnless(USE_READ_REPLICA, "the lookups read the file")
+class TestAppWritesShown(unittest.TestCase):
+    """ Writes made outside the batch are shown by the app's lookups (ReadSessionLocal) straight away """
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{self.db_dir.name}/app.db"
+        self.engine = create_db_engine(url, "batch")
+        Base.metadata.create_all(self.engine)
+        run_migrations(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        with open("fpl_bootstrap_example.json", encoding="utf-8") as f:
+            bootstrap = json.load(f)
+        self.elements = bootstrap["elements"][:15]
+        with self.Session() as db:
+            sync_teams(db, bootstrap["teams"])
+            sync_players(db, self.elements)
+            sync_batch_metadata(db, "setup", 20, 21)
+
+        self.replica = ReadReplica(create_db_engine(url, "app"))
+        self.replica_patch = mock.patch.object(ReadSessionLocal, "replica", self.replica)
+        self.replica_patch.start()
+        self.file_patch = mock.patch.object(lookup_helpers, "FileSessionLocal", sessionmaker(bind=self.replica.source_engine))
+        self.file_patch.start()
+        # loads the replica as of the batch run
+        self.assertIsNone(lookup_helpers.get_user_team_id("new@test.com"))
+
+    def tearDown(self):
+        self.replica_patch.stop()
+        self.file_patch.stop()
+        self.replica.close()
+        self.replica.source_engine.dispose()
+        self.engine.dispose()
+        self.db_dir.cleanup()
+
+    def test_new_user_picks_and_live_poll(self):
+        with self.Session() as db:
+            db.add(User(email="new@test.com", password_hash="-", name="new", team_id=7))
+            count_data_version(db)
+            db.commit()
+            sync_user_picks(db, 7, 20, picks_of(self.elements))
+        team = lookup_helpers.get_user_team("new@test.com")
+
+        data_version = self.replica.data_version
+
+        # the live points are read from the file, without reloading the replica
+        player_ids = [e["id"] for e in self.elements[:2]]
+        with self.Session() as db:
+            sync_player_live_stats(db, 20, [live_element(player_ids[0], 3), live_element(player_ids[1], 8)])
+        live_points = lookup_helpers.get_live_points(player_ids, 20)
+
+        self.assertEqual(lookup_helpers.get_user_team_id("new@test.com"), 7)
+        self.assertEqual(len(team), 15)
+        self.assertEqual(live_points, {player_ids[0]: 3, player_ids[1]: 8})
+        self.assertEqual(self.replica.data_version, data_version)
+
+    @unittest.skipUnless(importlib.util.find_spec("bcrypt"), "signup needs bcrypt")
+    def test_signup(self):
+        from auth import auth_services
+
+        team_data = {"picks": picks_of(self.elements), "entry_history": {"event_transfers": 0}}
+        with mock.patch.object(auth_services, "SessionLocal", self.Session), \
+                mock.patch.object(auth_services, "get_current_gameweek", return_value=20), \
+                mock.patch.object(auth_services, "fetch_fpl_team", return_value=team_data):
+            auth_services.create_user("new@test.com", "password", "new", 7)
+
+        self.assertEqual(lookup_helpers.get_user_team_id("new@test.com"), 7)
+        self.assertEqual(len(lookup_helpers.get_user_team("new@test.com")), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,35 @@
+import tempfile
 import unittest
-from database.sync_helpers import get_users
-from database.db import SessionLocal
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database.sync_helpers import (
+    get_users,
+    picks_hash,
+    get_batch_retries,
+    sync_batch_retries,
+    sync_batch_metadata,
+    sync_player_snapshots,
+    shadow_tables,
+    sync_team_metrics,
+    sync_rows,
+)
+from database.db import SessionLocal, Base, use_sqlite_transactions
+from database.models import BatchMetadata, BatchRetry, PlayerLiveStat, PlayerSnapshot, TeamMetric
+
+# after the database modules - the batch sets its engine profile when they are first imported
+import ffp_batch
+
+
+def live_stat(player_id, total_points):
+    return {
+        "player_id": player_id, "event": 20, "minutes": 90, "goals_scored": 0, "assists": 0,
+        "clean_sheets": 0, "goals_conceded": 0, "saves": 0, "yellow_cards": 0, "red_cards": 0,
+        "bonus": 0, "bps": 0, "total_points": total_points,
+    }
 
 
 class TestSyncHelpers(unittest.TestCase):
@@ -13,6 +42,176 @@ class TestSyncHelpers(unittest.TestCase):
         except Exception as e:
             print(f"Failed to get gameweek {e}")
 
+    def test_picks_hash(self):
+        picks = [
+            {"element": 1, "position": 1, "multiplier": 2, "is_captain": True, "is_vice_captain": False},
+            {"element": 2, "position": 12, "multiplier": 0, "is_captain": False, "is_vice_captain": True},
+        ]
+        same_order = list(reversed(picks))
+        captain_swapped = [
+            {**picks[0], "multiplier": 1, "is_captain": False},
+            {**picks[1], "multiplier": 2, "is_captain": True},
+        ]
+        bench_swapped = [{**picks[0], "position": 12}, {**picks[1], "position": 1}]
+
+        self.assertEqual(picks_hash(picks), picks_hash(same_order))
+        self.assertNotEqual(picks_hash(picks), picks_hash(captain_swapped))
+        self.assertNotEqual(picks_hash(picks), picks_hash(bench_swapped))
+
+    def test_batch_retries(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/retry.db")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            with Session() as db:
+                sync_batch_retries(db, "player", {7: "404", 9: "timeout"}, [1, 2])
+                sync_batch_retries(db, "player", {9: "timeout"}, [7])
+                sync_batch_retries(db, "user", {3: "500"}, [])
+                retries = get_batch_retries(db)
+                attempts = db.scalar(select(BatchRetry.attempts).where(BatchRetry.item_id == 9))
+            engine.dispose()
+
+        self.assertEqual(retries, {"player": [9], "user": [3]})
+        self.assertEqual(attempts, 2)
+
+    def test_batch_metadata(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/metadata.db")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            with Session() as db:
+                # a run without a gameweek before the first full one records nothing
+                self.assertEqual(sync_batch_metadata(db, "run0"), 0)
+                self.assertEqual(sync_batch_metadata(db, "run1", 18, 19), 1)
+                self.assertEqual(sync_batch_metadata(db, "run2"), 2)
+                row = db.scalars(select(BatchMetadata)).one()
+                values = (row.current_gameweek, row.next_gameweek, row.run_id, row.data_version)
+            engine.dispose()
+
+        self.assertEqual(values, (18, 19, "run2", 2))
+
+    def test_empty_retry_records_no_run(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/retry_run.db")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+            with Session() as db:
+                sync_batch_metadata(db, "run1", 18, 19)
+
+            with mock.patch.object(ffp_batch, "SessionLocal", Session), mock.patch.object(ffp_batch, "init_db"):
+                ffp_batch.main(["retry"])
+            with Session() as db:
+                data_version = db.scalar(select(BatchMetadata.data_version))
+            engine.dispose()
+
+        self.assertEqual(data_version, 1)
+
+    def test_player_snapshots_append_changes(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/snapshots.db")
+            use_sqlite_transactions(engine)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            with Session() as db:
+                first = sync_player_snapshots(db, 1, date(2025, 8, 1), {1: {"now_cost": 55, "form": 1.5}, 2: {"now_cost": 60, "form": 0}})
+                # only the changed price of player 1 is appended, a rerun on the same day writes nothing
+                second = sync_player_snapshots(db, 2, date(2025, 8, 8), {1: {"now_cost": 56, "form": 1.5}, 2: {"now_cost": 60, "form": 0}})
+                rerun = sync_player_snapshots(db, 2, date(2025, 8, 8), {1: {"now_cost": 56, "form": 1.5}, 2: {"now_cost": 60, "form": 0}})
+                rows = db.execute(select(PlayerSnapshot.player_id, PlayerSnapshot.snapshot_date, PlayerSnapshot.value)).all()
+                db.rollback()
+            engine.dispose()
+
+        self.assertEqual((first, second, rerun), (4, 1, 0))
+        self.assertEqual(len(rows), 5)
+        self.assertIn((1, date(2025, 8, 8), 56), rows)
+
+    def test_sync_rows_counts(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/diff.db")
+            use_sqlite_transactions(engine)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            with Session() as db:
+                first = sync_rows(db, PlayerLiveStat, [live_stat(1, 2), live_stat(2, 3), live_stat(3, 4)])
+                second = sync_rows(db, PlayerLiveStat, [live_stat(1, 2), live_stat(2, 8), live_stat(4, 1)])
+                points = dict(db.execute(select(PlayerLiveStat.player_id, PlayerLiveStat.total_points)).all())
+                db.rollback()
+            engine.dispose()
+
+        self.assertEqual(first, {"inserted": 3, "updated": 0, "deleted": 0})
+        self.assertEqual(second, {"inserted": 1, "updated": 1, "deleted": 1})
+        self.assertEqual(points, {1: 2, 2: 8, 4: 1})
+
+    def test_shadow_tables_publish(self):
+        def team_metric(team_id, goals):
+            return {
+                "team_id": team_id, "no_games_h": 3, "no_games_a": 3,
+                "no_goals_scored_h": goals, "no_goals_conceded_h": 0, "no_goals_scored_a": 0, "no_goals_conceded_a": 0,
+                "home_strength_attack": 0.5, "home_strength_defence": 0.5,
+                "away_strength_attack": 0.5, "away_strength_defence": 0.5,
+            }
+
+        def live_goals():
+            with Session() as db:
+                return db.scalars(select(TeamMetric.no_goals_scored_h).order_by(TeamMetric.team_id)).all()
+
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/shadow.db")
+            use_sqlite_transactions(engine)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            with Session() as db:
+                sync_team_metrics(db, [team_metric(1, 1), team_metric(2, 2)])
+
+                with shadow_tables(db, TeamMetric):
+                    sync_team_metrics(db, [team_metric(1, 5)])
+                    # readers still see the live table until the changes are published
+                    during = live_goals()
+                after = live_goals()
+
+                with self.assertRaises(ZeroDivisionError):
+                    with shadow_tables(db, TeamMetric):
+                        sync_team_metrics(db, [team_metric(1, 9)])
+                        1 / 0
+                after_failure = live_goals()
+                tables = db.connection().exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars().all()
+                db.rollback()
+            engine.dispose()
+
+        self.assertEqual(during, [1, 2])
+        self.assertEqual(after, [5])
+        self.assertEqual(after_failure, [5])
+        self.assertNotIn("TeamMetric__shadow", tables)
+
+    def test_shadow_tables_second_sync_in_block(self):
+        with tempfile.TemporaryDirectory() as db_dir:
+            engine = create_engine(f"sqlite:///{db_dir}/shadow_twice.db")
+            use_sqlite_transactions(engine)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            with Session() as db:
+                sync_rows(db, PlayerLiveStat, [live_stat(1, 2), live_stat(2, 6)])
+
+                with shadow_tables(db, PlayerLiveStat):
+                    sync_rows(db, PlayerLiveStat, [live_stat(1, 5), live_stat(3, 1)])
+                    # diffed against what the first sync staged, not the live table
+                    again = sync_rows(db, PlayerLiveStat, [live_stat(1, 5), live_stat(2, 7)])
+                    with self.assertRaises(ValueError):
+                        with shadow_tables(db, PlayerLiveStat):
+                            pass
+                points = dict(db.execute(select(PlayerLiveStat.player_id, PlayerLiveStat.total_points)).all())
+                db.rollback()
+            engine.dispose()
+
+        self.assertEqual(again, {"inserted": 1, "updated": 0, "deleted": 1})
+        self.assertEqual(points, {1: 5, 2: 7})
+
 
 if __name__ == "__main__":
     test = TestSyncHelpers()